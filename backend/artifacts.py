@@ -0,0 +1,108 @@
+# backend/artifacts.py
+# Extracted text of every uploaded document, kept next to the original in storage:
+#   classroom_{id}/documents/document_{id}/pages.jsonl.gz    one record per page
+#   classroom_{id}/documents/document_{id}/chunks.jsonl.gz   one record per chunk (what gets embedded)
+# Changing the embedding model, chunk size or vector store then only needs
+# `python reindex.py`, not another pass of PDF parsing.
+import io
+import gzip
+import json
+from langchain_core.documents import Document as LCDocument
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+
+def document_prefix(classroom_id: int, document_id: int) -> str:
+    return f"classroom_{classroom_id}/documents/document_{document_id}/"
+
+
+def pages_path(classroom_id: int, document_id: int) -> str:
+    return document_prefix(classroom_id, document_id) + "pages.jsonl.gz"
+
+
+def chunks_path(classroom_id: int, document_id: int) -> str:
+    return document_prefix(classroom_id, document_id) + "chunks.jsonl.gz"
+
+
+def chunk_id(document_id: int, index: int) -> str:
+    """Stable vector id, so re-indexing a document replaces its vectors instead of duplicating them."""
+    return f"doc{document_id}-chunk{index}"
+
+
+# ==========================================
+#      EXTRACTION
+# ==========================================
+
+def load_pages(local_path: str, filename: str) -> list[LCDocument]:
+    if filename.endswith(".pdf"):
+        loader = PyPDFLoader(local_path)
+    else:
+        loader = TextLoader(local_path, encoding="utf-8")
+    return loader.load()
+
+
+def split_pages(pages: list[LCDocument], chunk_size: int = CHUNK_SIZE,
+                chunk_overlap: int = CHUNK_OVERLAP) -> list[LCDocument]:
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+    return splitter.split_documents(pages)
+
+
+def page_records(pages: list[LCDocument]) -> list[dict]:
+    # Loader metadata holds the temp file path, only the page number is worth keeping
+    return [
+        {"page": page.metadata.get("page", i), "text": page.page_content}
+        for i, page in enumerate(pages)
+    ]
+
+
+def chunk_records(chunks: list[LCDocument], document_id: int, classroom_id: int, filename: str) -> list[dict]:
+    return [
+        {
+            "id": chunk_id(document_id, i),
+            "page": chunk.metadata.get("page"),
+            "text": chunk.page_content,
+            "metadata": {"document_id": document_id, "classroom_id": classroom_id, "filename": filename},
+        }
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def pages_from_records(records) -> list[LCDocument]:
+    return [LCDocument(page_content=r["text"], metadata={"page": r["page"]}) for r in records]
+
+
+# ==========================================
+#      STORAGE
+# ==========================================
+
+def write_jsonl_gz(storage, bucket_name: str, object_name: str, records: list[dict]):
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb") as gz:
+        for record in records:
+            gz.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+    size = buffer.tell()
+    buffer.seek(0)
+    storage.put_object(bucket_name, object_name, buffer, size, content_type="application/gzip")
+
+
+def read_jsonl_gz(storage, bucket_name: str, object_name: str) -> list[dict]:
+    response = storage.get_object(bucket_name, object_name)
+    try:
+        data = response.read()
+    finally:
+        response.close()
+        response.release_conn()
+    lines = gzip.decompress(data).decode("utf-8").splitlines()
+    return [json.loads(line) for line in lines if line]
+
+
+def save_artifacts(storage, bucket_name: str, classroom_id: int, document_id: int,
+                   pages: list[dict], chunks: list[dict]):
+    write_jsonl_gz(storage, bucket_name, pages_path(classroom_id, document_id), pages)
+    write_jsonl_gz(storage, bucket_name, chunks_path(classroom_id, document_id), chunks)
@@ -8,7 +8,8 @@ import bcrypt
 from dotenv import load_dotenv
 import os
 # Import from your other files
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 # 1. Removed UserInDB from this import
 from schemas import TokenData, User 
@@ -28,11 +29,12 @@ def get_password_hash(password: str) -> str:
     salt = bcrypt.gensalt()
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
-def get_user(db: Session, username: str):
-    return db.query(models.User).filter(models.User.username == username).first()
+async def get_user(db: AsyncSession, username: str):
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    return result.scalars().first()
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = get_user(db, username)
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await get_user(db, username)
     if not user:
         return False
     if not verify_password(password, user.hashed_password):
@@ -50,7 +52,7 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth_2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth_2_scheme), db: AsyncSession = Depends(get_db)):
     credential_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Couldn't validate Credentials",
@@ -66,7 +68,7 @@ async def get_current_user(token: str = Depends(oauth_2_scheme), db: Session = D
         raise credential_exception
     
     # Pass the injected db session here
-    user = get_user(db, username=token_data.username)
+    user = await get_user(db, username=token_data.username)
     if user is None:
         raise credential_exception
     return user
@@ -75,4 +77,19 @@ async def get_current_user(token: str = Depends(oauth_2_scheme), db: Session = D
 async def get_current_active_user(current_user: models.User = Depends(get_current_user)):
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive User")
-    return current_user
\ No newline at end of file
+    return current_user
+
+# Media players can't send the Authorization header, so playlist URLs carry
+# their own short-lived token. It has no "sub", so it never works as a login.
+PLAYLIST_TOKEN_EXPIRE_MINUTES = int(os.getenv("PLAYLIST_TOKEN_EXPIRE_MINUTES", 60))
+
+def create_playlist_token(job_id: str) -> str:
+    expire = datetime.now(timezone.utc) + timedelta(minutes=PLAYLIST_TOKEN_EXPIRE_MINUTES)
+    return jwt.encode({"playlist": job_id, "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+
+def verify_playlist_token(token: str, job_id: str) -> bool:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return False
+    return payload.get("playlist") == job_id
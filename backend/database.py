@@ -1,21 +1,44 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from dotenv import load_dotenv
 import os
 load_dotenv()
+from db_pool import pool_settings, instrument_engine, InstrumentedQueuePool, InstrumentedAsyncQueuePool
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+
+def async_database_url(url: str) -> str:
+    """Same database through an async driver: asyncpg for Postgres, aiosqlite for SQLite."""
+    scheme, sep, rest = url.partition("://")
+    drivers = {"postgresql": "postgresql+asyncpg", "postgres": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+    return drivers.get(scheme.split("+")[0], scheme) + sep + rest
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(SQLALCHEMY_DATABASE_URL)
+
+# Sync engine: the worker, CLI scripts and plain `def` routes (which FastAPI runs in its threadpool)
+# Pool size, overflow, timeout, recycle and pre-ping: DB_POOL_* env (see db_pool.py)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=InstrumentedQueuePool, **pool_settings())
+instrument_engine(engine, "sync")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine: every `async def` route, so a slow query never blocks the event loop.
+# Objects stay usable after commit; relationships must be loaded explicitly (selectinload).
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=InstrumentedAsyncQueuePool, **pool_settings())
+instrument_engine(async_engine.sync_engine, "async")
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 # Dependency to get DB session in routes
-def get_db():
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Same, for `def` routes
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
-
-
@@ -0,0 +1,105 @@
+# backend/db_pool.py
+# Connection pool settings and telemetry for the SQLAlchemy engines (database.py).
+#   - Size, overflow, timeout, recycle and pre-ping come from the environment.
+#     Each engine (sync and async) gets its own pool of that size.
+#   - Checkout waits, timeouts, overflow connections, invalidations (e.g. stale
+#     connections after a failover) and pool occupancy are exported to /metrics.
+import os
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from prometheus_client import Counter, Gauge, Histogram
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))          # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))          # seconds before a connection is replaced
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"       # test connections on checkout
+
+CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a connection from the pool",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 10, 30),
+)
+CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT",
+    ["engine"],
+)
+OVERFLOW_CONNECTIONS = Counter(
+    "db_pool_overflow_connections_total",
+    "Connections opened beyond DB_POOL_SIZE",
+    ["engine"],
+)
+INVALIDATED_CONNECTIONS = Counter(
+    "db_pool_invalidated_connections_total",
+    "Connections discarded as broken (failed pre-ping, disconnects)",
+    ["engine"],
+)
+POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Connections per pool and state (checked_out, idle, overflow, size)",
+    ["engine", "state"],
+    multiprocess_mode="livesum",  # summed over the live server processes (PROMETHEUS_MULTIPROC_DIR)
+)
+
+
+def pool_settings() -> dict:
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+class PoolMetricsMixin:
+    engine_name = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        overflow_before = self._overflow
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            CHECKOUT_TIMEOUTS.labels(engine=self.engine_name).inc()
+            raise
+        finally:
+            CHECKOUT_SECONDS.labels(engine=self.engine_name).observe(time.perf_counter() - start)
+            # _overflow counts up from -pool_size as connections are opened
+            if self._overflow > max(overflow_before, 0):
+                OVERFLOW_CONNECTIONS.labels(engine=self.engine_name).inc()
+            self._report_occupancy()
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._report_occupancy()
+
+    def _report_occupancy(self):
+        # Set on every checkout/return rather than read at scrape time: in multiprocess
+        # mode (PROMETHEUS_MULTIPROC_DIR) only values written by the process itself count
+        occupancy = {
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "size": self.size(),
+        }
+        for state, value in occupancy.items():
+            POOL_CONNECTIONS.labels(engine=self.engine_name, state=state).set(value)
+
+
+class InstrumentedQueuePool(PoolMetricsMixin, QueuePool):
+    engine_name = "sync"
+
+
+class InstrumentedAsyncQueuePool(PoolMetricsMixin, AsyncAdaptedQueuePool):
+    engine_name = "async"
+
+
+def instrument_engine(engine, name: str):
+    """Invalidation counter; pass async_engine.sync_engine for the async one."""
+    @event.listens_for(engine, "invalidate")
+    def count_invalidation(dbapi_connection, connection_record, exception):
+        INVALIDATED_CONNECTIONS.labels(engine=name).inc()
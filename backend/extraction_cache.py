@@ -0,0 +1,34 @@
+# backend/extraction_cache.py
+# Cache of the two LLM steps of a video job, keyed by the document's content hash:
+#   document text -> extracted LaTeX -> generated Manim code
+# Repeat submissions of the same notes skip both Gemini round trips.
+import os
+from render_cache import content_hash
+
+EXTRACTION_CACHE_TTL = int(os.getenv("EXTRACTION_CACHE_TTL", 30 * 24 * 3600))  # seconds
+
+
+class ExtractionCache:
+    def __init__(self, redis_conn, ttl: int = EXTRACTION_CACHE_TTL):
+        self.redis = redis_conn
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(content: str) -> str:
+        return f"extraction_cache:{content_hash(content)}"
+
+    def get(self, content: str) -> dict:
+        """Returns {"latex": ..., "code": ...} with whichever steps are cached."""
+        raw = self.redis.hgetall(self._key(content))
+        return {k.decode("utf-8"): v.decode("utf-8") for k, v in raw.items()}
+
+    def put(self, content: str, **fields):
+        key = self._key(content)
+        pipe = self.redis.pipeline()
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def drop(self, content: str, *fields):
+        """Forget cached steps (e.g. code that failed to render)."""
+        self.redis.hdel(self._key(content), *fields)
@@ -0,0 +1,60 @@
+# backend/fake_llm.py
+# Deterministic stand-in for Gemini, selected with LLM_PROVIDER=fake.
+# Used by the load-test harness so we can size pods without calling the provider.
+import os
+import time
+import asyncio
+import hashlib
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", 0.5))            # seconds before the first token
+FAKE_LLM_TOKENS_PER_SEC = float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", 200))
+FAKE_LLM_OUTPUT_TOKENS = int(os.getenv("FAKE_LLM_OUTPUT_TOKENS", 400))
+
+_WORDS = [
+    "energy", "force", "motion", "example", "imagine", "because", "therefore",
+    "the", "a", "of", "and", "is", "like", "your", "when", "this", "we", "see",
+]
+
+
+class FakeChatModel(BaseChatModel):
+    latency: float = FAKE_LLM_LATENCY
+    tokens_per_sec: float = FAKE_LLM_TOKENS_PER_SEC
+    output_tokens: int = FAKE_LLM_OUTPUT_TOKENS
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _duration(self) -> float:
+        return self.latency + self.output_tokens / self.tokens_per_sec
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        # Same prompt -> same answer, so runs are reproducible
+        prompt = "".join(str(m.content) for m in messages)
+        seed = hashlib.sha256(prompt.encode("utf-8")).digest()
+        words = [_WORDS[seed[i % len(seed)] % len(_WORDS)] for i in range(self.output_tokens)]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=" ".join(words)))])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self._duration())
+        return self._respond(messages)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self._duration())
+        return self._respond(messages)
@@ -0,0 +1,159 @@
+# backend/hls.py
+# Segmented (HLS) output for generated videos, enabled with VIDEO_OUTPUT=hls.
+# Manim writes one partial movie file per animation before it joins them into
+# the final MP4. While the render runs, a SegmentUploader:
+#   1. picks up every partial file that is finished (a newer one exists)
+#   2. remuxes it to an MPEG-TS segment with ffmpeg (no re-encode)
+#   3. uploads it and republishes an EVENT playlist in MinIO
+# so playback can start before the render has finished.
+import os
+import math
+import glob
+import shutil
+import threading
+import subprocess
+
+VIDEO_OUTPUT = os.getenv("VIDEO_OUTPUT", "mp4")              # "mp4" or "hls"
+HLS_TARGET_DURATION = int(os.getenv("HLS_TARGET_DURATION", 10))
+HLS_POLL_INTERVAL = float(os.getenv("HLS_POLL_INTERVAL", 1))
+FFMPEG = shutil.which("ffmpeg") or "ffmpeg"
+FFPROBE = shutil.which("ffprobe") or "ffprobe"
+
+PLAYLIST_NAME = "playlist.m3u8"
+
+
+def hls_enabled() -> bool:
+    return VIDEO_OUTPUT == "hls"
+
+
+def playlist_path(job_id: str) -> str:
+    return f"generated_videos/{job_id}/{PLAYLIST_NAME}"
+
+
+def segment_prefix(job_id: str) -> str:
+    return f"generated_videos/{job_id}/"
+
+
+def probe_duration(path: str) -> float:
+    out = subprocess.run(
+        [FFPROBE, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+        capture_output=True, text=True, check=True, timeout=30,
+    )
+    return float(out.stdout.strip())
+
+
+def render_playlist(segments: list, ended: bool) -> str:
+    """segments: (filename, duration) pairs in playback order."""
+    target = max([HLS_TARGET_DURATION] + [math.ceil(d) for _, d in segments])
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{target}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        # EVENT: segments are only ever appended, players may start from the top
+        "#EXT-X-PLAYLIST-TYPE:EVENT",
+    ]
+    for name, duration in segments:
+        lines.append(f"#EXTINF:{duration:.3f},")
+        lines.append(name)
+    if ended:
+        lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+class SegmentUploader(threading.Thread):
+    def __init__(self, job_id: str, media_dir: str, storage, bucket_name: str):
+        super().__init__(name=f"hls-{job_id}", daemon=True)
+        self.job_id = job_id
+        self.media_dir = media_dir
+        self.storage = storage
+        self.bucket_name = bucket_name
+        self.segments: list[tuple[str, float]] = []
+        self.offset = 0.0          # running timestamp offset, so segments play back to back
+        self.error: Exception | None = None
+        self._done = set()
+        self._render_finished = threading.Event()
+        self._render_ok = True
+        self._segment_dir = os.path.join(media_dir, "hls")
+        os.makedirs(self._segment_dir, exist_ok=True)
+
+    def _partial_files(self) -> list[str]:
+        # Rendered with caching disabled, so the names are uncached_00000.mp4, uncached_00001.mp4, ...
+        pattern = os.path.join(self.media_dir, "videos", "**", "partial_movie_files", "**", "*.mp4")
+        return sorted(glob.glob(pattern, recursive=True), key=os.path.basename)
+
+    def _publish_playlist(self, ended: bool = False):
+        body = render_playlist(self.segments, ended).encode("utf-8")
+        local = os.path.join(self._segment_dir, PLAYLIST_NAME)
+        with open(local, "wb") as f:
+            f.write(body)
+        self.storage.fput_object(
+            self.bucket_name, playlist_path(self.job_id), local,
+            content_type="application/vnd.apple.mpegurl"
+        )
+
+    def _add_segment(self, partial: str):
+        name = f"segment_{len(self.segments):05d}.ts"
+        local = os.path.join(self._segment_dir, name)
+        subprocess.run(
+            [
+                FFMPEG, "-v", "error", "-y", "-i", partial,
+                "-c", "copy", "-bsf:v", "h264_mp4toannexb",
+                "-output_ts_offset", f"{self.offset:.3f}",
+                "-f", "mpegts", local,
+            ],
+            check=True, timeout=120,
+        )
+        duration = probe_duration(partial)
+        self.storage.fput_object(self.bucket_name, segment_prefix(self.job_id) + name, local, content_type="video/mp2t")
+        os.remove(local)
+
+        self.segments.append((name, duration))
+        self.offset += duration
+        self._publish_playlist()
+
+    def _upload_ready(self, include_last: bool):
+        partials = [p for p in self._partial_files() if p not in self._done]
+        if not include_last:
+            # The newest file may still be being written
+            partials = partials[:-1]
+        for partial in partials:
+            self._add_segment(partial)
+            self._done.add(partial)
+
+    def run(self):
+        try:
+            # Empty playlist first, so players can open it as soon as the job starts rendering
+            self._publish_playlist()
+            while not self._render_finished.wait(HLS_POLL_INTERVAL):
+                self._upload_ready(include_last=False)
+            if not self._render_ok:
+                return
+            self._upload_ready(include_last=True)
+            self._publish_playlist(ended=True)
+        except Exception as e:
+            # Streaming is best effort: the MP4 is still uploaded as usual
+            print(f"⚠️ HLS segmenting failed for Job {self.job_id}: {e}")
+            self.error = e
+
+    def _remove_uploads(self):
+        """Deletes the playlist and segments of a stream that will never end."""
+        names = [PLAYLIST_NAME] + [name for name, _ in self.segments]
+        for name in names:
+            try:
+                self.storage.remove_object(self.bucket_name, segment_prefix(self.job_id) + name)
+            except Exception as e:
+                print(f"⚠️ Could not remove HLS object {name} of Job {self.job_id}: {e}")
+
+    def finish(self, render_ok: bool = True) -> bool:
+        """
+        Called once the render has ended. Returns True if the playlist is complete;
+        otherwise its objects are removed (the job's playlist_path must be cleared).
+        """
+        self._render_ok = render_ok
+        self._render_finished.set()
+        self.join()
+        complete = render_ok and self.error is None and bool(self.segments)
+        if not complete:
+            self._remove_uploads()
+        return complete
@@ -0,0 +1,41 @@
+# backend/http_ranges.py
+# Conditional and partial responses for the proxied document download:
+#   Range: bytes=...    -> 206 with Content-Range (or 416 if unsatisfiable)
+#   If-None-Match: ...  -> 304 when the client's copy is current
+from typing import Optional
+from fastapi import HTTPException
+
+
+def parse_range(header: Optional[str], size: int):
+    """
+    Parses a single `bytes=` range into (start, end), inclusive.
+    Returns None to serve the whole file, raises 416 if it can't be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None  # no range, or multiple ranges: a full response is allowed
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start, end = max(0, size - int(last)), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header lists `etag` (quoted) or is `*`."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [t.strip() for t in if_none_match.split(",")]
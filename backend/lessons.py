@@ -0,0 +1,114 @@
+# backend/lessons.py
+# Shared LLM setup and prompts, used by both the API routes and the RQ worker.
+import os
+from datetime import datetime, timedelta
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+
+LLM_MODEL = "gemini-2.5-flash-lite"
+
+# "google" (default) or "fake" (deterministic local model, see fake_llm.py)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "google")
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "huggingface")
+
+# How many students of a classroom are personalized at the same time
+# by the batch job (keeps us under the provider's rate limit)
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 5))
+
+# Syllabus pre-generation: which grade levels get a baseline lesson per topic,
+# and the local hour (0-23) the job is scheduled for
+PRECOMPUTE_GRADE_LEVELS = [
+    g.strip() for g in os.getenv("PRECOMPUTE_GRADE_LEVELS", "Grade 6,Grade 8,Grade 10").split(",") if g.strip()
+]
+OFFPEAK_HOUR = int(os.getenv("OFFPEAK_HOUR", 2))
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+PERSONALIZE_TEMPLATE = """
+    You are an expert educational content creator.
+
+    Goal: Rewrite the following entire educational text to make it personalized for a student.
+
+    Student Profile:
+    - Name: {name}
+    - Grade: {grade}
+    - Interest: {interest}
+
+    Instructions:
+    1. Read the provided text below.
+    2. Rewrite the content to match the student's reading level ({grade}).
+    3. Explain the core concepts using analogies, metaphors, and examples related to their interest: "{interest}".
+    4. Maintain the original educational facts but change the tone and delivery style.
+
+    Original Text:
+    {full_text}
+
+    Personalized Version:
+    """
+
+
+BASELINE_TEMPLATE = """
+    You are an expert teacher writing a standard lesson for a class.
+
+    Grade Level: {grade}
+    The Lesson Topic is: {topic}
+
+    Use the following educational content (Context) to write a complete, engaging lesson
+    on the topic at the reading level of the grade. Keep it neutral so it can later be
+    personalized for individual students.
+
+    Context:
+    {context}
+
+    Lesson:
+    """
+
+
+def get_llm(temperature: float):
+    """Returns the chat model used for lesson generation."""
+    if LLM_PROVIDER == "fake":
+        from fake_llm import FakeChatModel
+        return FakeChatModel()
+
+    google_api_key = os.getenv("AI_API_KEY")
+    return ChatGoogleGenerativeAI(
+        model=LLM_MODEL,  # Ensure you use a model with large context
+        google_api_key=google_api_key,
+        temperature=temperature
+    )
+
+
+def get_embedding_model():
+    """Returns the embedding model used for the vector store."""
+    if EMBEDDING_PROVIDER == "fake":
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        return DeterministicFakeEmbedding(size=384)  # same size as all-MiniLM-L6-v2
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+
+
+def build_personalize_chain():
+    """Prompt -> LLM -> str chain for rewriting a whole document for one student."""
+    prompt = ChatPromptTemplate.from_template(PERSONALIZE_TEMPLATE)
+    return prompt | get_llm(temperature=0.5) | StrOutputParser()
+
+
+def personalized_topic(filename: str) -> str:
+    return f"Full Rewrite: {filename}"
+
+
+def build_baseline_chain():
+    """Prompt -> LLM -> str chain for a baseline (non-personalized) lesson."""
+    prompt = ChatPromptTemplate.from_template(BASELINE_TEMPLATE)
+    return prompt | get_llm(temperature=0.3) | StrOutputParser()
+
+
+def next_offpeak_time(now: datetime | None = None) -> datetime:
+    """Next occurrence of OFFPEAK_HOUR (local time)."""
+    now = now or datetime.now()
+    run_at = now.replace(hour=OFFPEAK_HOUR, minute=0, second=0, microsecond=0)
+    if run_at <= now:
+        run_at += timedelta(days=1)
+    return run_at
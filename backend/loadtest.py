@@ -0,0 +1,252 @@
+# backend/loadtest.py
+"""
+End-to-end load test for the API.
+
+Runs the FastAPI app in-process against:
+  - a deterministic fake LLM + fake embeddings (LLM_PROVIDER=fake, see fake_llm.py)
+  - a local Redis stand-in (fakeredis TCP server)
+  - the local filesystem storage backend (STORAGE_BACKEND=local, see storage.py)
+  - a throwaway SQLite database
+
+and reports p50/p95/p99 latency and throughput for registration, login,
+upload, lesson generation and video enqueue.
+
+Usage (from backend/):
+    python loadtest.py --students 100 --concurrency 25 --llm-latency 0.8 --llm-tokens-per-sec 150
+
+To load-test a real deployment instead, start it with LLM_PROVIDER=fake and
+EMBEDDING_PROVIDER=fake and pass --base-url http://host:8000.
+"""
+import os
+import io
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+
+import httpx
+
+QUESTIONS = [
+    "Why do objects fall at the same speed?",
+    "What is the difference between mass and weight?",
+    "How does friction slow things down?",
+    "What happens to energy when a ball bounces?",
+]
+
+SAMPLE_DOCUMENT = (
+    "Newton's laws of motion describe the relationship between a body and the forces acting on it.\n"
+    "The first law states that an object remains at rest or in uniform motion unless acted on by a force.\n"
+    "The second law states that force equals mass times acceleration, F = ma.\n"
+    "The third law states that for every action there is an equal and opposite reaction.\n"
+) * 40
+
+
+# ==========================================
+#      LOCAL STAND-INS
+# ==========================================
+
+def start_fake_redis(port: int):
+    from fakeredis import TcpFakeServer
+
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    server.daemon_threads = True  # don't keep the process alive after the run
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def build_local_app(args, workdir: str):
+    """Configures the environment for local stand-ins, then imports the app."""
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["EMBEDDING_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_LATENCY"] = str(args.llm_latency)
+    os.environ["FAKE_LLM_TOKENS_PER_SEC"] = str(args.llm_tokens_per_sec)
+    os.environ["FAKE_LLM_OUTPUT_TOKENS"] = str(args.llm_output_tokens)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+    os.environ["CHROMA_DIR"] = os.path.join(workdir, "chroma_db")
+    os.environ["REDIS_HOST"] = "127.0.0.1"
+    os.environ["REDIS_PORT"] = str(args.redis_port)
+    os.environ["STORAGE_BACKEND"] = "local"
+    os.environ["LOCAL_STORAGE_ROOT"] = os.path.join(workdir, "objects")
+    os.environ.setdefault("SECRET_KEY", "loadtest-secret")
+    os.environ.setdefault("GEMINI_API_KEY", "loadtest-unused")  # the video worker is not run here
+
+    start_fake_redis(args.redis_port)
+
+    from database import Base, engine
+    from main import app
+
+    Base.metadata.create_all(bind=engine)
+    return app
+
+
+# ==========================================
+#      MEASUREMENT
+# ==========================================
+
+class Recorder:
+    def __init__(self):
+        self.durations = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.first_start = {}
+        self.last_end = {}
+
+    async def timed(self, name: str, request):
+        start = time.perf_counter()
+        try:
+            response = await request
+            ok = response.status_code < 400
+        except Exception:
+            response, ok = None, False
+        end = time.perf_counter()
+
+        if ok:
+            self.durations[name].append(end - start)
+        else:
+            self.errors[name] += 1
+        self.first_start[name] = min(self.first_start.get(name, start), start)
+        self.last_end[name] = max(self.last_end.get(name, end), end)
+        return response if ok else None
+
+    def report(self):
+        print()
+        print(f"{'endpoint':<18}{'ok':>7}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+        for name in self.first_start:
+            samples = sorted(self.durations[name])
+            window = self.last_end[name] - self.first_start[name]
+            throughput = len(samples) / window if window > 0 else 0.0
+            print(
+                f"{name:<18}{len(samples):>7}{self.errors[name]:>6}"
+                f"{percentile(samples, 50):>10.1f}{percentile(samples, 95):>10.1f}"
+                f"{percentile(samples, 99):>10.1f}{throughput:>9.1f}"
+            )
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of sorted samples, in milliseconds."""
+    if not samples:
+        return 0.0
+    rank = max(0, min(len(samples) - 1, round(p / 100 * len(samples) + 0.5) - 1))
+    return samples[rank] * 1000
+
+
+# ==========================================
+#      SCENARIO
+# ==========================================
+
+async def register_and_login(client, rec, username, role):
+    await rec.timed("register", client.post("/register", json={
+        "username": username,
+        "password": "loadtest-password",
+        "full_name": username.title(),
+        "role": role,
+    }))
+    response = await rec.timed("login", client.post("/token", data={
+        "username": username,
+        "password": "loadtest-password",
+    }))
+    if response is None:
+        return None
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_student(client, rec, args, index, classroom_id):
+    headers = await register_and_login(client, rec, f"student_{args.run_id}_{index}", "student")
+    if headers is None:
+        return
+    await client.post(f"/classrooms/{classroom_id}/join", headers=headers)
+
+    for n in range(args.lessons_per_student):
+        question = QUESTIONS[(index + n) % len(QUESTIONS)]
+        await rec.timed("generate_lesson", client.post("/chat/generate_lesson", headers=headers, json={
+            "student_name": f"Student {index}",
+            "student_grade": "Grade 8",
+            "student_interest": "football",
+            "topic": "Newton's Laws",
+            "question": question,
+            "classroom_id": classroom_id,
+        }))
+
+    for _ in range(args.videos_per_student):
+        await rec.timed("video_enqueue", client.post(
+            "/generate/from-doc", headers=headers, data={"text": "F = ma relates force, mass and acceleration."}
+        ))
+
+
+async def run_scenario(client, args):
+    rec = Recorder()
+
+    # 1. Teachers create classrooms and upload material
+    classroom_ids = []
+    for t in range(args.classrooms):
+        headers = await register_and_login(client, rec, f"teacher_{args.run_id}_{t}", "teacher")
+        if headers is None:
+            continue
+        response = await client.post("/classrooms/", headers=headers, json={"name": f"Physics {t}"})
+        if response.status_code >= 400:
+            continue
+        classroom_id = response.json()["id"]
+        classroom_ids.append(classroom_id)
+
+        for d in range(args.uploads_per_classroom):
+            files = {"file": (f"notes_{d}.txt", io.BytesIO(SAMPLE_DOCUMENT.encode("utf-8")), "text/plain")}
+            await rec.timed("upload", client.post(
+                f"/classrooms/{classroom_id}/documents", headers=headers, files=files
+            ))
+
+    if not classroom_ids:
+        print("❌ Could not create any classroom, aborting.")
+        return rec
+
+    # 2. Students hit the API with bounded concurrency
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(index):
+        async with semaphore:
+            await run_student(client, rec, args, index, classroom_ids[index % len(classroom_ids)])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded(i) for i in range(args.students)))
+    print(f"⏱️ Student phase: {time.perf_counter() - start:.1f}s for {args.students} students")
+    return rec
+
+
+async def main_async(args):
+    workdir = tempfile.mkdtemp(prefix="loadtest_")
+    try:
+        if args.base_url:
+            transport, base_url = None, args.base_url
+        else:
+            app = build_local_app(args, workdir)
+            transport, base_url = httpx.ASGITransport(app=app), "http://loadtest"
+
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout) as client:
+            rec = await run_scenario(client, args)
+        rec.report()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the API with a fake LLM provider.")
+    parser.add_argument("--base-url", default=None, help="Target a running server instead of the in-process app")
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--classrooms", type=int, default=2)
+    parser.add_argument("--uploads-per-classroom", type=int, default=2)
+    parser.add_argument("--lessons-per-student", type=int, default=2)
+    parser.add_argument("--videos-per-student", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds before the first token")
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=200)
+    parser.add_argument("--llm-output-tokens", type=int, default=400)
+    parser.add_argument("--redis-port", type=int, default=6390)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args(argv)
+    args.run_id = str(int(time.time()))
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
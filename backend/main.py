@@ -1,6 +1,12 @@
-from fastapi import FastAPI
+import os
+import hmac
+import time
+from fastapi import FastAPI, Request, Response, HTTPException
 from routes import router  # Import the router we just made
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, multiprocess
+from timing import TIMING_DEBUG, start_request, server_timing_header
+from pagination import NEXT_CURSOR_HEADER
 app = FastAPI()
 app.add_middleware(
     CORSMiddleware,
@@ -8,7 +14,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],  # paginated lists (see pagination.py)
 )
+# Per-stage timing breakdown in a Server-Timing header (TIMING_DEBUG=1)
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next):
+    if not TIMING_DEBUG:
+        return await call_next(request)
+    start = time.perf_counter()
+    stages = start_request()
+    response = await call_next(request)
+    if stages:
+        response.headers["Server-Timing"] = server_timing_header(stages, time.perf_counter() - start)
+    return response
+# Prometheus scrape endpoint (stage histograms etc.); a route, not a mount,
+# so /metrics answers 200 itself instead of redirecting to /metrics/
+# Only served with METRICS_TOKEN set, to scrapers sending "Authorization: Bearer <token>".
+# With several server processes, set PROMETHEUS_MULTIPROC_DIR (an empty directory, before
+# the server starts): every process writes its metrics there and each scrape sums them all.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
 # Plug it in!
 @app.get("/")
 async def root():
@@ -1,17 +1,35 @@
 from minio import Minio
 from minio.error import S3Error
 import os
+import urllib3
 
-MINIO_ENDPOINT = "localhost:9000"
-MINIO_ACCESS_KEY = "minioadmin"
-MINIO_SECRET_KEY = "minioadmin"
-BUCKET_NAME = "edu-platform"
+MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "localhost:9000")
+MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
+MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
+MINIO_SECURE = os.getenv("MINIO_SECURE", "0") == "1"
+BUCKET_NAME = os.getenv("BUCKET_NAME", "edu-platform")
+# A known region means signing a URL never needs a GetBucketLocation round trip
+MINIO_REGION = os.getenv("MINIO_REGION", "us-east-1")
+
+# Storage calls from async routes run on a bounded pool (see storage.py), and the
+# HTTP connection pool is sized to match, so no thread ever waits for a connection
+STORAGE_MAX_WORKERS = int(os.getenv("STORAGE_MAX_WORKERS", 16))
+STORAGE_TIMEOUT = float(os.getenv("STORAGE_TIMEOUT", 30))  # seconds, connect and read
+
+http_client = urllib3.PoolManager(
+    maxsize=STORAGE_MAX_WORKERS,
+    block=True,
+    timeout=urllib3.Timeout(connect=STORAGE_TIMEOUT, read=STORAGE_TIMEOUT),
+    retries=urllib3.Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+)
 
 minio_client = Minio(
     MINIO_ENDPOINT,
     access_key=MINIO_ACCESS_KEY,
     secret_key=MINIO_SECRET_KEY,
-    secure=False,
+    secure=MINIO_SECURE,
+    region=MINIO_REGION,
+    http_client=http_client,
 )
 
 def ensure_bucket():
@@ -20,4 +38,4 @@ def ensure_bucket():
             minio_client.make_bucket(BUCKET_NAME)
     except S3Error as e:
         print("❌ MinIO error:", e)
-        raise
\ No newline at end of file
+        raise
@@ -1,5 +1,5 @@
 # backend/models.py
-from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, Table, Float, ARRAY
+from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, Table, Float, ARRAY, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from database import Base
 import enum
@@ -16,7 +16,10 @@ classroom_students = Table(
     'classroom_students',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id')),
-    Column('classroom_id', Integer, ForeignKey('classrooms.id'))
+    Column('classroom_id', Integer, ForeignKey('classrooms.id')),
+    # Enrollment checks filter by user (and classroom), rosters and student counts by classroom
+    Index('ix_classroom_students_user_id_classroom_id', 'user_id', 'classroom_id'),
+    Index('ix_classroom_students_classroom_id', 'classroom_id')
 )
 
 class User(Base):
@@ -71,6 +74,7 @@ class Document(Base):
 
     # Processing status
     is_processed = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
     classroom = relationship("Classroom", back_populates="documents")
 class GeneratedLesson(Base):
@@ -82,6 +86,16 @@ class GeneratedLesson(Base):
     student_id = Column(Integer, ForeignKey("users.id"))
     
     student = relationship("User", back_populates="generated_lessons")
+class BaselineLesson(Base):
+    __tablename__ = "baseline_lessons"
+    __table_args__ = (UniqueConstraint("topic", "grade_level", name="uq_baseline_lessons_topic_grade"),)
+
+    # Pre-generated (off-peak) lesson per syllabus topic and grade level
+    id = Column(Integer, primary_key=True, index=True)
+    topic = Column(String, index=True)
+    grade_level = Column(String, index=True)
+    content = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
 class GeneratedVideo(Base):
     __tablename__ = "generated_videos"
 
@@ -91,6 +105,19 @@ class GeneratedVideo(Base):
     status = Column(String, default="queued") # queued, processing, completed, failed
     minio_path = Column(String, nullable=True) # Stores "generated_videos/xyz.mp4"
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Written by the worker itself, so reads never need to ask Redis
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    error = Column(String, nullable=True)
+
+    # High-quality render, queued at lower priority after the preview is published
+    hq_job_id = Column(String, nullable=True)
+    hq_status = Column(String, nullable=True) # queued, completed, failed
+    hq_minio_path = Column(String, nullable=True)
+
+    # HLS playlist (VIDEO_OUTPUT=hls), published while the preview is still rendering
+    playlist_path = Column(String, nullable=True)
     
     user_id = Column(Integer, ForeignKey("users.id"))
     
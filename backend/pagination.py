@@ -0,0 +1,44 @@
+# backend/pagination.py
+# Keyset (cursor) pagination for the history and listing endpoints.
+#   GET /videos/mine?limit=20                first page
+#   GET /videos/mine?limit=20&cursor=<next>  following pages
+# The response body stays a plain list; the cursor of the next page comes in the
+# X-Next-Cursor header (absent on the last page). The cursor is the id of the last
+# row sent, so every page is one index range scan, however deep the client pages,
+# and rows inserted meanwhile never shift the pages.
+import os
+from typing import Optional
+from fastapi import Query, Response
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", 50))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 200))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    """Dependency for the `limit` and `cursor` query parameters."""
+
+    def __init__(
+        self,
+        limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[int] = Query(None, description="X-Next-Cursor of the previous page"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+
+
+def paginate(query, id_column, page: PageParams | None = None, descending: bool = False):
+    """Orders by id and, given a page, continues after its cursor. Fetches one extra row to detect a next page."""
+    if page is None:
+        return query.order_by(id_column)
+    if page.cursor is not None:
+        query = query.where(id_column < page.cursor if descending else id_column > page.cursor)
+    return query.order_by(id_column.desc() if descending else id_column).limit(page.limit + 1)
+
+
+def next_page(response: Response, rows: list, page: PageParams) -> list:
+    """Drops the extra row and, if there was one, sets the cursor of the next page."""
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = str(rows[-1].id)
+    return rows
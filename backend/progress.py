@@ -0,0 +1,134 @@
+# backend/progress.py
+# Live progress of video jobs.
+#   - The worker publishes every stage on a Redis channel per job and also keeps
+#     the latest event, so a browser that connects late still sees where the job is.
+#   - The API relays the events to the browser as Server-Sent Events. Each API
+#     process holds ONE pub/sub connection (ProgressHub) and fans the events out to
+#     its viewers, so open tabs don't take connections from the shared Redis pool.
+import os
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+PROGRESS_TTL = int(os.getenv("PROGRESS_TTL", 3600))                # seconds the latest event is kept
+SSE_KEEPALIVE_INTERVAL = float(os.getenv("SSE_KEEPALIVE_INTERVAL", 15))
+
+# Preview stages, in order: started, latex_extracted, code_generated, rendering, uploading,
+# then one of completed / failed / cancelled. HQ re-renders follow with hq_rendering,
+# then hq_completed / hq_failed, on the same channel.
+FINAL_STAGES = {"failed", "cancelled", "hq_completed", "hq_failed"}
+
+
+def progress_channel(job_id: str) -> str:
+    return f"video_progress:{job_id}"
+
+
+def last_event_key(job_id: str) -> str:
+    return f"video_progress_last:{job_id}"
+
+
+def publish_progress(redis_conn, job_id: str, stage: str, **data):
+    """Called by the worker (sync Redis client) whenever a job reaches a new stage."""
+    event = json.dumps({"job_id": job_id, "stage": stage, "ts": time.time(), **data})
+    pipe = redis_conn.pipeline()
+    pipe.set(last_event_key(job_id), event, ex=PROGRESS_TTL)
+    pipe.publish(progress_channel(job_id), event)
+    pipe.execute()
+
+
+def is_final(event: dict) -> bool:
+    """True once nothing more will be published for this job."""
+    if event["stage"] == "completed":
+        return not event.get("hq_pending")
+    return event["stage"] in FINAL_STAGES
+
+
+def format_sse(event: dict) -> str:
+    return f"event: progress\ndata: {json.dumps(event)}\n\n"
+
+
+class ProgressHub:
+    """Per-process subscriber to every job's progress channel, fanned out to in-memory queues."""
+
+    def __init__(self, async_redis):
+        self.redis = async_redis
+        self._listeners: dict[str, set[asyncio.Queue]] = {}
+        self._task: asyncio.Task | None = None
+        self._ready: asyncio.Event | None = None
+
+    async def _ensure_listening(self):
+        if self._task is None or self._task.done():
+            self._ready = asyncio.Event()
+            self._task = asyncio.create_task(self._listen())
+        await self._ready.wait()
+
+    async def _listen(self):
+        reconnecting = False
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.psubscribe(progress_channel("*"))
+                if reconnecting:
+                    # Events published while we were away: resend each viewer the latest one
+                    for job_id in list(self._listeners):
+                        last = await self.redis.get(last_event_key(job_id))
+                        if last is not None:
+                            self._dispatch(job_id, last)
+                self._ready.set()
+
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        channel = message["channel"].decode("utf-8")
+                        self._dispatch(channel.split(":", 1)[1], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Progress subscriber lost Redis, reconnecting: {e}")
+                reconnecting = True
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def _dispatch(self, job_id: str, data):
+        for queue in self._listeners.get(job_id, ()):
+            queue.put_nowait(data)
+
+    @asynccontextmanager
+    async def subscribe(self, job_id: str):
+        """Queue receiving the raw events of one job while the block runs."""
+        await self._ensure_listening()
+        queue = asyncio.Queue()
+        self._listeners.setdefault(job_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            listeners = self._listeners.get(job_id)
+            listeners.discard(queue)
+            if not listeners:
+                del self._listeners[job_id]
+
+
+async def stream_progress(hub: ProgressHub, job_id: str):
+    """Yields SSE messages for a job until its final event."""
+    # Subscribe before reading the latest event, so nothing published in between is lost
+    async with hub.subscribe(job_id) as queue:
+        last = await hub.redis.get(last_event_key(job_id))
+        if last is not None:
+            event = json.loads(last)
+            yield format_sse(event)
+            if is_final(event):
+                return
+
+        while True:
+            try:
+                data = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+
+            event = json.loads(data)
+            yield format_sse(event)
+            if is_final(event):
+                return
@@ -0,0 +1,287 @@
+# backend/reconciler.py
+# Garbage collection of what failed uploads, crashed workers and deleted classrooms leave behind:
+#   1. Document rows whose upload never finished (empty storage_path)
+#   2. Objects under classroom_*/documents/ whose Document row is gone
+#   3. Videos under generated_videos/ that no GeneratedVideo row or render cache entry points to
+#   4. temp_{job_id} work dirs and temp_* upload files in the working directory
+#   5. Vectors in classroom_docs for documents that no longer exist
+# Nothing younger than GC_GRACE_PERIOD is touched, so in-flight uploads and renders are safe.
+#
+#   python reconciler.py [--dry-run] [--vectors]   one full pass, including this node's files
+# supervisor.py runs it periodically: the shared sweep (1-3) is enqueued once per GC_INTERVAL
+# on the batch queue, whichever node wins the lock, and each node sweeps its own files (4).
+# Chroma lives in a local directory, so vectors (5) are only swept on the node that owns
+# the store the API uses: set GC_VECTOR_STORE=1 there (or pass --vectors).
+import os
+import re
+import time
+import shutil
+import argparse
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from rq import Queue
+
+load_dotenv()
+
+from database import SessionLocal
+import models
+from storage import storage_client, BUCKET_NAME
+from redis_client import redis_conn
+from render_cache import RENDER_CACHE_TTL
+
+GC_GRACE_PERIOD = int(os.getenv("GC_GRACE_PERIOD", 6 * 3600))   # seconds; longer than any job timeout
+GC_INTERVAL = int(os.getenv("GC_INTERVAL", 3600))               # seconds between periodic sweeps
+GC_LOCK_KEY = "gc_reconciler:lock"
+CHROMA_DIR = os.getenv("CHROMA_DIR", "./chroma_db")
+GC_VECTOR_STORE = os.getenv("GC_VECTOR_STORE", "0") == "1"     # this node owns CHROMA_DIR
+VECTOR_PAGE_SIZE = 5000
+
+DOCUMENT_OBJECT = re.compile(r"^classroom_(\d+)/documents/document_(\d+)/")
+TEMP_PREFIX = "temp_"
+
+
+def new_report() -> dict:
+    return {
+        "stale_uploads": 0, "document_objects": 0, "video_objects": 0,
+        "vectors": 0, "temp_paths": 0, "bytes_reclaimed": 0,
+    }
+
+
+# ==========================================
+#      DATABASE
+# ==========================================
+
+def sweep_stale_uploads(db, cutoff: datetime, report: dict, dry_run: bool):
+    """Rows created before their upload failed. Rows from before created_at existed count as old."""
+    stale = db.query(models.Document).filter(
+        models.Document.storage_path == "",
+        (models.Document.created_at == None) | (models.Document.created_at < cutoff)
+    ).all()
+    for doc in stale:
+        print(f"🗑️ Stale upload: document {doc.id} ({doc.filename})")
+        if not dry_run:
+            db.delete(doc)
+    if not dry_run:
+        db.commit()
+    report["stale_uploads"] += len(stale)
+
+
+# ==========================================
+#      OBJECT STORAGE
+# ==========================================
+
+def referenced_videos(db, redis_conn, dry_run: bool = False) -> tuple[set, tuple]:
+    """Video objects still in use: (exact paths, HLS directory prefixes)."""
+    paths, prefixes = set(), []
+    rows = db.query(
+        models.GeneratedVideo.minio_path,
+        models.GeneratedVideo.hq_minio_path,
+        models.GeneratedVideo.playlist_path
+    ).all()
+    for minio_path, hq_minio_path, playlist in rows:
+        paths.update(p for p in (minio_path, hq_minio_path) if p)
+        if playlist:
+            prefixes.append(playlist.rsplit("/", 1)[0] + "/")
+
+    # Cache hits reuse another job's video, so cached renders stay alive on their own
+    keys = list(redis_conn.scan_iter(match="render_cache:*", count=1000))
+    pipe = redis_conn.pipeline(transaction=False)
+    for i in range(0, len(keys), 1000):
+        batch = keys[i:i + 1000]
+        pipe.mget(batch)
+        for key in batch:
+            pipe.ttl(key)
+        values, *ttls = pipe.execute()
+        paths.update(v.decode("utf-8") for v in values if v)
+
+        # Entries written before render_cache had a TTL would otherwise live forever
+        if not dry_run:
+            for key, ttl in zip(batch, ttls):
+                if ttl == -1:
+                    pipe.expire(key, RENDER_CACHE_TTL)
+            pipe.execute()
+    return paths, tuple(prefixes)
+
+
+def remove_objects(objects: list, report: dict, key: str, dry_run: bool):
+    for obj in objects:
+        print(f"🗑️ Orphaned object: {obj.object_name} ({obj.size or 0} bytes)")
+        if not dry_run:
+            storage_client.remove_object(BUCKET_NAME, obj.object_name)
+        report["bytes_reclaimed"] += obj.size or 0
+    report[key] += len(objects)
+
+
+def sweep_objects(db, redis_conn, cutoff: datetime, report: dict, dry_run: bool):
+    aware_cutoff = cutoff.replace(tzinfo=timezone.utc)
+
+    def old_enough(obj) -> bool:
+        return obj.last_modified is None or obj.last_modified < aware_cutoff
+
+    # Originals and text artifacts of documents that no longer exist (or moved classroom)
+    live_documents = dict(db.query(models.Document.id, models.Document.classroom_id).all())
+    orphans = []
+    for obj in storage_client.list_objects(BUCKET_NAME, prefix="classroom_", recursive=True):
+        match = DOCUMENT_OBJECT.match(obj.object_name)
+        if not match or not old_enough(obj):
+            continue
+        classroom_id, document_id = int(match.group(1)), int(match.group(2))
+        if live_documents.get(document_id) != classroom_id:
+            orphans.append(obj)
+    remove_objects(orphans, report, "document_objects", dry_run)
+
+    # Videos (MP4s and HLS segments) of rows that were deleted or renders that failed
+    paths, prefixes = referenced_videos(db, redis_conn, dry_run)
+    orphans = [
+        obj for obj in storage_client.list_objects(BUCKET_NAME, prefix="generated_videos/", recursive=True)
+        if old_enough(obj) and obj.object_name not in paths and not obj.object_name.startswith(prefixes)
+    ]
+    remove_objects(orphans, report, "video_objects", dry_run)
+
+
+# ==========================================
+#      VECTORS
+# ==========================================
+
+def sweep_vectors(db, report: dict, dry_run: bool, collection: str = "classroom_docs"):
+    # Opening a missing directory would create an empty store instead
+    if not os.path.isdir(CHROMA_DIR):
+        print(f"⚠️ No vector store at {CHROMA_DIR} on this node, skipping the vector sweep")
+        return
+    from langchain_community.vectorstores import Chroma
+
+    # No embedding model needed: vectors are only listed and deleted
+    vector_store = Chroma(collection_name=collection, persist_directory=CHROMA_DIR)
+    live_documents = {doc_id for (doc_id,) in db.query(models.Document.id).all()}
+
+    # Collect first, delete after: deleting while paging by offset would skip entries
+    orphan_ids, offset = [], 0
+    while True:
+        page = vector_store.get(include=["metadatas"], limit=VECTOR_PAGE_SIZE, offset=offset)
+        if not page["ids"]:
+            break
+        for vector_id, metadata in zip(page["ids"], page["metadatas"]):
+            document_id = (metadata or {}).get("document_id")
+            if document_id is not None and document_id not in live_documents:
+                orphan_ids.append(vector_id)
+        offset += len(page["ids"])
+
+    print(f"🗑️ Orphaned vectors: {len(orphan_ids)} of {offset}")
+    if not dry_run:
+        for i in range(0, len(orphan_ids), VECTOR_PAGE_SIZE):
+            vector_store.delete(ids=orphan_ids[i:i + VECTOR_PAGE_SIZE])
+    report["vectors"] += len(orphan_ids)
+
+
+# ==========================================
+#      TEMP FILES (per node)
+# ==========================================
+
+def path_stats(path: str) -> tuple[float, int]:
+    """(newest mtime, total size); Manim writes deep inside work dirs, not at the top."""
+    if not os.path.isdir(path):
+        st = os.stat(path)
+        return st.st_mtime, st.st_size
+    newest, size = os.stat(path).st_mtime, 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.stat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            newest, size = max(newest, st.st_mtime), size + st.st_size
+    return newest, size
+
+
+def sweep_temp_files(directory: str = ".", report: dict | None = None, dry_run: bool = False) -> dict:
+    report = report if report is not None else new_report()
+    cutoff = time.time() - GC_GRACE_PERIOD
+    for name in os.listdir(directory):
+        if not name.startswith(TEMP_PREFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            newest, size = path_stats(path)
+        except FileNotFoundError:
+            continue  # finished and cleaned up while we looked
+        if newest >= cutoff:
+            continue
+
+        print(f"🗑️ Leftover temp path: {path} ({size} bytes)")
+        if not dry_run:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+        report["temp_paths"] += 1
+        report["bytes_reclaimed"] += size
+    return report
+
+
+# ==========================================
+#      ENTRY POINTS
+# ==========================================
+
+def sweep_node(temp_dir: str, report: dict | None = None, dry_run: bool = False,
+               vectors: bool = GC_VECTOR_STORE) -> dict:
+    """The part of a pass only this node can do: its temp files, and the vectors if it owns the store."""
+    report = sweep_temp_files(temp_dir, report, dry_run)
+    if vectors:
+        db = SessionLocal()
+        try:
+            sweep_vectors(db, report, dry_run)
+        finally:
+            db.close()
+    return report
+
+
+def reconcile(redis_conn, dry_run: bool = False, temp_dir: str | None = None,
+              vectors: bool = GC_VECTOR_STORE) -> dict:
+    """One pass over DB rows and storage (and this node's files, if temp_dir is given)."""
+    start = time.perf_counter()
+    report = new_report()
+    cutoff = datetime.utcnow() - timedelta(seconds=GC_GRACE_PERIOD)
+
+    db = SessionLocal()
+    try:
+        # Rows first, so their partial objects are collected in the same pass
+        sweep_stale_uploads(db, cutoff, report, dry_run)
+        sweep_objects(db, redis_conn, cutoff, report, dry_run)
+    finally:
+        db.close()
+
+    if temp_dir is not None:
+        sweep_node(temp_dir, report, dry_run, vectors)
+
+    action = "Would reclaim" if dry_run else "Reclaimed"
+    print(f"♻️ {action} {report['bytes_reclaimed'] / 1e6:.1f} MB in {time.perf_counter() - start:.1f}s: "
+          f"{report['stale_uploads']} stale uploads, {report['document_objects']} document objects, "
+          f"{report['video_objects']} video objects, {report['vectors']} vectors, {report['temp_paths']} temp paths")
+    return report
+
+
+def reconcile_task():
+    """RQ entry point of the shared sweep (enqueued by enqueue_if_due); any node may run it."""
+    from rq import get_current_job
+    return reconcile(get_current_job().connection, vectors=False)
+
+
+def enqueue_if_due(redis_conn, queue_name: str) -> bool:
+    """Enqueues one shared sweep per GC_INTERVAL, however many supervisors call this."""
+    if not redis_conn.set(GC_LOCK_KEY, os.getpid(), nx=True, ex=GC_INTERVAL):
+        return False
+    Queue(queue_name, connection=redis_conn).enqueue(
+        "reconciler.reconcile_task", job_timeout=GC_INTERVAL, result_ttl=7 * 24 * 3600
+    )
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove orphaned objects, vectors, rows and temp files.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+    parser.add_argument("--temp-dir", default=".", help="Where temp_* files of this node live")
+    parser.add_argument("--vectors", action="store_true", default=GC_VECTOR_STORE,
+                        help="Also sweep the vector store in CHROMA_DIR (run on the node that owns it)")
+    args = parser.parse_args()
+
+    reconcile(redis_conn, dry_run=args.dry_run, temp_dir=args.temp_dir, vectors=args.vectors)
@@ -0,0 +1,46 @@
+# backend/redis_client.py
+# The Redis clients of a process, each on one bounded connection pool.
+# A pool that is full makes callers wait up to REDIS_POOL_TIMEOUT instead of
+# opening yet another connection; health checks drop connections Redis has closed.
+# SSE streams share one pub/sub connection per process (progress.ProgressHub).
+import os
+from redis import Redis, BlockingConnectionPool
+from redis import asyncio as aioredis
+from redis.retry import Retry
+from redis.asyncio.retry import Retry as AsyncRetry
+from redis.backoff import ExponentialWithJitterBackoff
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 100))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 5))              # seconds to wait for a free connection
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 5))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+REDIS_RETRIES = int(os.getenv("REDIS_RETRIES", 3))                          # on dropped connections, with backoff
+# Unset by default: RQ workers block on the queues for minutes at a time
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT")) if os.getenv("REDIS_SOCKET_TIMEOUT") else None
+
+
+def pool_settings() -> dict:
+    return {
+        "host": REDIS_HOST,
+        "port": REDIS_PORT,
+        "max_connections": REDIS_MAX_CONNECTIONS,
+        "timeout": REDIS_POOL_TIMEOUT,
+        "socket_connect_timeout": REDIS_CONNECT_TIMEOUT,
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+    }
+
+
+# Sync: RQ, caches, progress publishing
+redis_conn = Redis(connection_pool=BlockingConnectionPool(
+    retry=Retry(ExponentialWithJitterBackoff(), REDIS_RETRIES), **pool_settings()
+))
+# Async: the streaming endpoints, so waiting for events never blocks the event loop
+async_redis_conn = aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool(
+    retry=AsyncRetry(ExponentialWithJitterBackoff(), REDIS_RETRIES), **pool_settings()
+))
@@ -0,0 +1,153 @@
+# backend/reindex.py
+"""
+Rebuilds document vectors from the stored text artifacts (see artifacts.py),
+without downloading or parsing a single PDF.
+
+Usage (from backend/):
+    python reindex.py                                  # every processed document
+    python reindex.py --classroom 3                    # one classroom
+    python reindex.py --rechunk --chunk-size 800       # new chunking, from the stored pages
+    python reindex.py --collection classroom_docs_v2   # build a new collection side by side
+    python reindex.py --backfill                       # parse originals that have no artifacts yet
+
+Embedding model and vector store come from the usual env (EMBEDDING_PROVIDER, CHROMA_DIR).
+"""
+import os
+import time
+import tempfile
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from database import SessionLocal
+import models
+from storage import storage_client, STORAGE_ERRORS
+from lessons import get_embedding_model
+from langchain_community.vectorstores import Chroma
+from artifacts import (
+    CHUNK_SIZE, CHUNK_OVERLAP, pages_path, chunks_path, read_jsonl_gz, save_artifacts,
+    load_pages, split_pages, page_records, chunk_records, pages_from_records,
+)
+
+CHROMA_DIR = os.getenv("CHROMA_DIR", "./chroma_db")
+
+
+def backfill_artifacts(doc: models.Document) -> list[dict]:
+    """Parses the original once and stores its artifacts (documents uploaded before they existed)."""
+    response = storage_client.get_object(doc.bucket_name, doc.storage_path)
+    suffix = os.path.splitext(doc.filename)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        try:
+            for chunk in response.stream(32 * 1024):
+                tmp.write(chunk)
+        finally:
+            response.close()
+            response.release_conn()
+    try:
+        pages = load_pages(tmp.name, doc.filename)
+    finally:
+        os.remove(tmp.name)
+
+    chunks = chunk_records(split_pages(pages), doc.id, doc.classroom_id, doc.filename)
+    save_artifacts(storage_client, doc.bucket_name, doc.classroom_id, doc.id, page_records(pages), chunks)
+    return chunks
+
+
+def load_chunks(doc: models.Document, args) -> list[dict] | None:
+    """The chunk records to embed for a document, or None if it has no artifacts."""
+    try:
+        if args.rechunk:
+            pages = pages_from_records(
+                read_jsonl_gz(storage_client, doc.bucket_name, pages_path(doc.classroom_id, doc.id))
+            )
+            chunks = chunk_records(
+                split_pages(pages, args.chunk_size, args.chunk_overlap), doc.id, doc.classroom_id, doc.filename
+            )
+            # Later re-indexes start from the new chunking
+            save_artifacts(storage_client, doc.bucket_name, doc.classroom_id, doc.id, page_records(pages), chunks)
+            return chunks
+        return read_jsonl_gz(storage_client, doc.bucket_name, chunks_path(doc.classroom_id, doc.id))
+    except STORAGE_ERRORS:
+        if args.backfill and doc.storage_path:
+            print(f"📄 Backfilling artifacts for document {doc.id} ({doc.filename})")
+            return backfill_artifacts(doc)
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild document vectors from stored text artifacts.")
+    parser.add_argument("--classroom", type=int, help="Only this classroom")
+    parser.add_argument("--document", type=int, help="Only this document")
+    parser.add_argument("--collection", default="classroom_docs", help="Target Chroma collection")
+    parser.add_argument("--batch-size", type=int, default=256, help="Chunks embedded per call")
+    parser.add_argument("--rechunk", action="store_true", help="Re-split the stored pages instead of reusing chunks")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--backfill", action="store_true", help="Parse originals that have no artifacts yet")
+    args = parser.parse_args()
+
+    vector_store = Chroma(
+        collection_name=args.collection,
+        embedding_function=get_embedding_model(),
+        persist_directory=CHROMA_DIR
+    )
+
+    db = SessionLocal()
+    try:
+        query = db.query(models.Document).filter(models.Document.is_processed == True)
+        if args.classroom:
+            query = query.filter(models.Document.classroom_id == args.classroom)
+        if args.document:
+            query = query.filter(models.Document.id == args.document)
+        documents = query.order_by(models.Document.id).all()
+    finally:
+        db.close()
+
+    print(f"🔁 Re-indexing {len(documents)} documents into '{args.collection}'...")
+    start = time.perf_counter()
+    pending, indexed, missing, total_chunks = [], 0, [], 0
+    cleared = set()
+
+    def flush():
+        # One embedding call per batch, across document boundaries
+        nonlocal total_chunks
+        if not pending:
+            return
+        # Drop the old vectors of documents reaching the store for the first time:
+        # a re-chunk may produce fewer chunks than before
+        new_ids = list({r["metadata"]["document_id"] for r in pending} - cleared)
+        if new_ids:
+            vector_store.delete(where={"document_id": {"$in": new_ids}})
+            cleared.update(new_ids)
+        vector_store.add_texts(
+            texts=[r["text"] for r in pending],
+            metadatas=[r["metadata"] for r in pending],
+            ids=[r["id"] for r in pending]
+        )
+        total_chunks += len(pending)
+        pending.clear()
+
+    for doc in documents:
+        chunks = load_chunks(doc, args)
+        if chunks is None:
+            missing.append(doc.id)
+            continue
+        if not chunks:
+            vector_store.delete(where={"document_id": doc.id})  # nothing to replace them with
+
+        for record in chunks:
+            pending.append(record)
+            if len(pending) >= args.batch_size:
+                flush()
+        indexed += 1
+    flush()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Re-indexed {indexed} documents ({total_chunks} chunks) in {elapsed:.1f}s")
+    if missing:
+        print(f"⚠️ No artifacts for documents {missing}; run with --backfill to parse their originals")
+
+
+if __name__ == "__main__":
+    main()
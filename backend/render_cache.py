@@ -0,0 +1,57 @@
+# backend/render_cache.py
+# Content-addressed cache of rendered videos.
+# Maps sha256(scene code) and sha256(extracted LaTeX) to an MP4 already in MinIO,
+# so repeated content skips Gemini + Manim entirely.
+# Entries expire RENDER_CACHE_TTL after their last hit, so the keyspace stays bounded
+# and renders nobody asks for any more become collectable (see reconciler.py).
+import os
+import hashlib
+from storage import STORAGE_ERRORS
+
+RENDER_CACHE_TTL = int(os.getenv("RENDER_CACHE_TTL", 30 * 24 * 3600))  # seconds
+
+KINDS = ("code", "latex")
+
+
+def content_hash(text: str) -> str:
+    # Whitespace at the edges doesn't change the render
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    def __init__(self, redis_conn, storage, bucket_name: str, ttl: int = RENDER_CACHE_TTL):
+        self.redis = redis_conn
+        self.storage = storage
+        self.bucket_name = bucket_name
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(kind: str, text: str, quality: str = "low_quality") -> str:
+        assert kind in KINDS
+        if quality == "low_quality":
+            return f"render_cache:{kind}:{content_hash(text)}"
+        return f"render_cache:{kind}:{quality}:{content_hash(text)}"
+
+    def lookup(self, kind: str, text: str, quality: str = "low_quality") -> str | None:
+        """Returns the MinIO path of a cached render, or None."""
+        key = self._key(kind, text, quality)
+        # A hit keeps the entry alive for another TTL
+        path = self.redis.getex(key, ex=self.ttl)
+        if path is None:
+            return None
+        path = path.decode("utf-8")
+
+        # The object may have been removed since; drop the stale entry
+        try:
+            self.storage.stat_object(self.bucket_name, path)
+        except STORAGE_ERRORS:
+            self.redis.delete(key)
+            return None
+        return path
+
+    def store(self, minio_path: str, code: str | None = None, latex: str | None = None,
+              quality: str = "low_quality"):
+        if code:
+            self.redis.set(self._key("code", code, quality), minio_path, ex=self.ttl)
+        if latex:
+            self.redis.set(self._key("latex", latex, quality), minio_path, ex=self.ttl)
@@ -0,0 +1,411 @@
+# backend/render_executor.py
+# Runs Manim renders with hard limits. Two modes (RENDER_MODE):
+#   "subprocess" (default): one `python -m manim` process per render
+#     - hard wall-clock timeout and address-space (memory) limit per render
+#     - bounded number of concurrent renders per node (RENDERS_PER_CORE * cores),
+#       counted in Redis across every worker process of the host (RenderSlots)
+#     - stdout/stderr captured to a log file next to the render
+#     - cancellation (kills the whole process group, LaTeX included)
+#   "warm": one long-lived worker per RQ worker process that imports Manim once
+#     (started with the RQ worker) and renders in-process, replaced every
+#     RENDER_WORKER_MAX_JOBS jobs
+import os
+import uuid
+import socket
+import signal
+import subprocess
+import threading
+import time
+import multiprocessing
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from redis.exceptions import RedisError
+from redis_client import redis_conn
+
+try:
+    import resource  # POSIX only
+except ImportError:
+    resource = None
+
+RENDER_TIMEOUT = int(os.getenv("RENDER_TIMEOUT", 240))                 # seconds
+RENDER_MEMORY_LIMIT_MB = int(os.getenv("RENDER_MEMORY_LIMIT_MB", 4096))
+RENDERS_PER_CORE = float(os.getenv("RENDERS_PER_CORE", 0.5))
+MAX_CONCURRENT_RENDERS = max(1, int((os.cpu_count() or 1) * RENDERS_PER_CORE))
+RENDER_MODE = os.getenv("RENDER_MODE", "subprocess")
+RENDER_WORKER_MAX_JOBS = int(os.getenv("RENDER_WORKER_MAX_JOBS", 20))  # recycle to bound memory leaks
+RENDER_SLOT_POLL_INTERVAL = float(os.getenv("RENDER_SLOT_POLL_INTERVAL", 0.5))
+
+# Manim config name -> CLI flag
+QUALITY_FLAGS = {
+    "low_quality": "-ql",
+    "medium_quality": "-qm",
+    "high_quality": "-qh",
+    "production_quality": "-qp",
+}
+
+
+class RenderError(Exception):
+    def __init__(self, message: str, log_tail: str = ""):
+        super().__init__(message)
+        self.log_tail = log_tail
+
+    def __str__(self):
+        if self.log_tail:
+            return f"{self.args[0]}\n--- render log (tail) ---\n{self.log_tail}"
+        return self.args[0]
+
+
+def _tail(path: str, max_bytes: int = 4000) -> str:
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - max_bytes))
+            return f.read().decode("utf-8", errors="replace")
+    except OSError:
+        return ""
+
+
+def _cancel_requested(job_id: str, cancel_check) -> bool:
+    """Polls cancel_check(); a failing check (e.g. Redis down) must not abort the render."""
+    if cancel_check is None:
+        return False
+    try:
+        return bool(cancel_check())
+    except Exception as e:
+        print(f"⚠️ Cancel check of render {job_id} failed: {e}")
+        return False
+
+
+def _apply_limits(memory_limit_mb: int):
+    """Runs in the child before exec."""
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+# ==========================================
+#      NODE-WIDE RENDER SLOTS
+# ==========================================
+
+# KEYS[1]: sorted set of slot holders, scored by lease expiry
+# ARGV: now, limit, lease expiry, holder token, key TTL
+ACQUIRE_SLOT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[4])
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+    return 1
+end
+return 0
+"""
+
+
+class RenderSlots:
+    """
+    Counting semaphore in Redis shared by every worker process of this host:
+    each RQ worker runs one job at a time, so only a cross-process count caps renders.
+    Slots are leased for the render timeout (plus a margin), so a crashed worker's
+    slot comes back on its own.
+    """
+
+    def __init__(self, redis_conn, limit: int = MAX_CONCURRENT_RENDERS, key: str | None = None):
+        self.redis = redis_conn
+        self.limit = limit
+        self.key = key or f"render_slots:{socket.gethostname()}"
+        self._acquire = redis_conn.register_script(ACQUIRE_SLOT)
+
+    def try_acquire(self, token: str, lease: int) -> bool:
+        now = time.time()
+        return bool(self._acquire(keys=[self.key], args=[now, self.limit, now + lease, token, lease]))
+
+    def release(self, token: str):
+        self.redis.zrem(self.key, token)
+
+    @contextmanager
+    def hold(self, job_id: str, timeout: int, cancel_check=None):
+        """Waits for a free slot (raises RenderError if cancelled meanwhile), holds it for the block."""
+        token = f"{job_id}:{uuid.uuid4().hex}"
+        lease = timeout + 60
+        try:
+            acquired = self.try_acquire(token, lease)
+            if not acquired:
+                print(f"⏳ Render {job_id} waiting for one of {self.limit} render slots...")
+            while not acquired:
+                if _cancel_requested(job_id, cancel_check):
+                    raise RenderError(f"Render {job_id} was cancelled.")
+                time.sleep(RENDER_SLOT_POLL_INTERVAL)
+                acquired = self.try_acquire(token, lease)
+        except RedisError as e:
+            print(f"⚠️ Render slots unavailable, rendering without a slot: {e}")
+            acquired = False
+
+        try:
+            yield
+        finally:
+            if acquired:
+                try:
+                    self.release(token)
+                except RedisError:
+                    pass  # the lease expires on its own
+
+
+class RenderExecutor:
+    def __init__(
+        self,
+        slots: RenderSlots | None = None,
+        timeout: int = RENDER_TIMEOUT,
+        memory_limit_mb: int = RENDER_MEMORY_LIMIT_MB,
+    ):
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.slots = slots
+        self._running: dict[str, subprocess.Popen] = {}
+        self._cancelled: set[str] = set()
+        self._lock = threading.Lock()
+
+    def run(self, job_id: str, cmd: list, log_path: str, cwd: str | None = None,
+            timeout: int | None = None, cancel_check=None):
+        """
+        Runs `cmd` and waits for it. Raises RenderError on non-zero exit,
+        timeout or cancellation. `cancel_check()` is polled once per second.
+        """
+        timeout = timeout or self.timeout
+        preexec = None
+        if resource is not None and self.memory_limit_mb > 0:
+            preexec = lambda: _apply_limits(self.memory_limit_mb)
+
+        with self._slot(job_id, timeout, cancel_check):
+            with open(log_path, "wb") as log:
+                proc = subprocess.Popen(
+                    cmd,
+                    cwd=cwd,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                    stdin=subprocess.DEVNULL,
+                    start_new_session=True,  # own process group, so LaTeX children die with it
+                    preexec_fn=preexec,
+                )
+                with self._lock:
+                    self._running[job_id] = proc
+
+                try:
+                    exit_code = self._wait(job_id, proc, timeout, cancel_check)
+                finally:
+                    with self._lock:
+                        self._running.pop(job_id, None)
+                        cancelled = job_id in self._cancelled
+                        self._cancelled.discard(job_id)
+
+        if cancelled:
+            raise RenderError(f"Render {job_id} was cancelled.", _tail(log_path))
+        if exit_code is None:
+            raise RenderError(f"Render {job_id} timed out after {timeout}s.", _tail(log_path))
+        if exit_code != 0:
+            raise RenderError(f"Manim exited with code {exit_code}.", _tail(log_path))
+
+    def _slot(self, job_id, timeout, cancel_check):
+        if self.slots is None:
+            return nullcontext()
+        return self.slots.hold(job_id, timeout, cancel_check)
+
+    def _wait(self, job_id, proc, timeout, cancel_check):
+        """Returns the exit code, or None if the process had to be killed for the timeout."""
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                try:
+                    return proc.wait(timeout=1)
+                except subprocess.TimeoutExpired:
+                    pass
+
+                if _cancel_requested(job_id, cancel_check):
+                    self.cancel(job_id)
+                if time.monotonic() >= deadline:
+                    self._kill(proc)
+                    proc.wait()
+                    return None
+        except BaseException:
+            # e.g. RQ's JobTimeoutException: never leave Manim running behind us
+            self._kill(proc)
+            proc.wait()
+            raise
+
+    def cancel(self, job_id: str) -> bool:
+        """Kills a running render. Returns False if it is not running here."""
+        with self._lock:
+            proc = self._running.get(job_id)
+            if proc is None:
+                return False
+            self._cancelled.add(job_id)
+        self._kill(proc)
+        return True
+
+    @staticmethod
+    def _kill(proc: subprocess.Popen):
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(proc.pid, signal.SIGKILL)
+            else:
+                proc.kill()
+        except ProcessLookupError:
+            pass
+
+
+# ==========================================
+#      WARM (PRE-FORKED) RENDER WORKERS
+# ==========================================
+
+def _warm_up(memory_limit_mb: int):
+    """Runs once in every pool worker: apply limits, pay the Manim import."""
+    if resource is not None and memory_limit_mb > 0:
+        _apply_limits(memory_limit_mb)
+    import manim  # noqa: F401
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _render_in_worker(script_path: str, scene_name: str, media_dir: str, quality: str, log_path: str,
+                      config_overrides: dict | None = None) -> str:
+    """Renders one scene inside a warm worker and returns the MP4 path."""
+    import runpy
+    import logging
+    from contextlib import redirect_stdout, redirect_stderr
+    from manim import tempconfig
+
+    # Line-buffered so the log tail survives a kill on timeout
+    with open(log_path, "w", encoding="utf-8", buffering=1) as log, redirect_stdout(log), redirect_stderr(log):
+        # Manim logs through `logging` (its handler holds the original stderr), not print
+        handler = logging.StreamHandler(log)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        manim_logger = logging.getLogger("manim")
+        manim_logger.addHandler(handler)
+        try:
+            # Fresh module namespace and config per job, nothing leaks into the next one
+            namespace = runpy.run_path(script_path, run_name="__render__")
+            scene_cls = namespace[scene_name]
+            with tempconfig({"media_dir": media_dir, "quality": quality, **(config_overrides or {})}):
+                scene = scene_cls()
+                scene.render()
+                return str(scene.renderer.file_writer.movie_file_path)
+        finally:
+            manim_logger.removeHandler(handler)
+
+
+class WarmRenderPool:
+    """
+    ONE warm worker per RQ worker process: RQ runs one job at a time, and the node-wide
+    limit comes from the render slots. With a single slot, killing the pool on a
+    timeout or cancel only ever takes down the render that timed out.
+    The worker is replaced every max_jobs_per_worker renders (bounds leaks in Manim).
+    """
+
+    def __init__(
+        self,
+        slots: RenderSlots | None = None,
+        timeout: int = RENDER_TIMEOUT,
+        memory_limit_mb: int = RENDER_MEMORY_LIMIT_MB,
+        max_jobs_per_worker: int = RENDER_WORKER_MAX_JOBS,
+    ):
+        self.slots = slots
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._pool = None
+        self._jobs = 0
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # forkserver: workers fork from a server that already imported Manim
+                if "forkserver" in multiprocessing.get_all_start_methods():
+                    ctx = multiprocessing.get_context("forkserver")
+                    ctx.set_forkserver_preload(["manim"])
+                else:
+                    ctx = multiprocessing.get_context("spawn")
+                self._pool = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=ctx,
+                    initializer=_warm_up,
+                    initargs=(self.memory_limit_mb,),
+                )
+                self._jobs = 0
+            return self._pool
+
+    def start(self, wait: bool = True):
+        """Starts the worker now, so the first job doesn't pay process start and Manim import."""
+        future = self._get_pool().submit(_ping)
+        if wait:
+            future.result()
+
+    def _reset(self):
+        """Kills the worker (on timeout/cancel/crash); the next render starts a fresh one."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        for proc in list(getattr(pool, "_processes", {}).values()):
+            proc.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _recycle_if_due(self):
+        with self._lock:
+            self._jobs += 1
+            if self._jobs < self.max_jobs_per_worker:
+                return
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)  # idle by now: our render just finished
+        self.start(wait=False)
+
+    def render(self, job_id: str, script_path: str, media_dir: str, quality: str,
+               log_path: str, scene_name: str = "MathScene", cancel_check=None,
+               config_overrides: dict | None = None, timeout: int | None = None) -> str:
+        timeout = timeout or self.timeout
+        slot = self.slots.hold(job_id, timeout, cancel_check) if self.slots is not None else nullcontext()
+        with slot:
+            result = self._render(job_id, script_path, media_dir, quality, log_path, scene_name,
+                                  cancel_check, config_overrides, timeout)
+        self._recycle_if_due()
+        return result
+
+    def _render(self, job_id, script_path, media_dir, quality, log_path, scene_name,
+                cancel_check, config_overrides, timeout) -> str:
+        future = self._get_pool().submit(
+            _render_in_worker, script_path, scene_name, media_dir, quality, log_path, config_overrides
+        )
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                try:
+                    return future.result(timeout=1)
+                except FutureTimeoutError:
+                    pass
+                except BrokenProcessPool as e:
+                    # The worker died (e.g. hit the memory limit); start fresh next time
+                    self._reset()
+                    raise RenderError(f"Render {job_id} crashed its worker: {e}", _tail(log_path))
+                except Exception as e:
+                    if not future.done():
+                        raise  # raised in this thread (e.g. RQ's job timeout), not by the scene
+                    raise RenderError(f"Render {job_id} failed: {e}", _tail(log_path))
+
+                if _cancel_requested(job_id, cancel_check):
+                    self._reset()
+                    raise RenderError(f"Render {job_id} was cancelled.", _tail(log_path))
+                if time.monotonic() >= deadline:
+                    self._reset()
+                    raise RenderError(f"Render {job_id} timed out after {timeout}s.", _tail(log_path))
+        except RenderError:
+            raise
+        except BaseException:
+            # e.g. RQ's JobTimeoutException: the render must not keep running in the worker
+            self._reset()
+            raise
+
+
+render_slots = RenderSlots(redis_conn)
+render_executor = RenderExecutor(slots=render_slots)
+warm_render_pool = WarmRenderPool(slots=render_slots)
@@ -5,61 +5,73 @@ import os
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
-from sqlalchemy.orm import Session  
-from database import get_db         
+from sqlalchemy import select, exists, func
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_sync_db
 import models
-from schemas import Token, User, UserCreate, ClassroomCreate, Classroom, DocumentResponse, VectorResponse
-from schemas import PersonalizeRequest
+from schemas import Token, User, UserCreate, ClassroomCreate, Classroom, ClassroomSummary, DocumentResponse, VectorResponse
+from schemas import PersonalizeRequest, BatchPersonalizeRequest, BatchPersonalizeResponse
+from schemas import BaselineLessonResponse
 from auth import (
     authenticate_user, 
     create_access_token, 
     get_current_active_user, 
     get_password_hash, 
-    ACCESS_TOKEN_EXPIRE_MINUTES
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    create_playlist_token,
+    verify_playlist_token
 )
-from minio_client import minio_client, BUCKET_NAME
-from typing import List
+from minio_client import BUCKET_NAME
+import storage
+from storage import storage_client, url_cache, download_url_cache, LocalStorage, STORAGE_ERRORS
+from typing import List, Optional
 
 # --- NEW IMPORTS FOR EMBEDDINGS ---
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 from schemas import ChatRequest, GeneratedLessonResponse
 from schemas import GeneratedVideoResponse
 import uuid
-from redis import Redis
-from rq import Queue
+from rq import Queue, Callback
 from schemas import VideoStatusResponse
-from worker import process_doc_to_video_task
-from fastapi import File, UploadFile, Form
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-redis_conn = Redis(host=REDIS_HOST, port=REDIS_PORT)
-queue = Queue(connection=redis_conn)
+from worker import process_doc_to_video_task, cancel_key, interactive_queue, ingestion_queue
+from fastapi import File, UploadFile, Form, Request, Response
+from lessons import build_personalize_chain, personalized_topic, get_llm, get_embedding_model
+from singleflight import SingleFlight, make_key
+from artifacts import load_pages, split_pages, page_records, chunk_records, save_artifacts
+from timing import stage
+from pagination import PageParams, paginate, next_page
+from http_ranges import parse_range, etag_matches
+from progress import publish_progress, stream_progress, format_sse, ProgressHub
+from fastapi.responses import StreamingResponse, RedirectResponse, FileResponse
+CHROMA_DIR = os.getenv("CHROMA_DIR", "./chroma_db")
+# Shared pooled clients (REDIS_* env, see redis_client.py)
+from redis_client import redis_conn, async_redis_conn
+lesson_flight = SingleFlight(async_redis_conn, namespace="generate_lesson")
+# One pub/sub connection for every SSE viewer of this process
+progress_hub = ProgressHub(async_redis_conn)
 
 router = APIRouter()
 
 # --- 1. Setup Vector Store (Matches your script) ---
 # Load the model once (this downloads 'all-MiniLM-L6-v2' locally)
-embedding_model = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+embedding_model = get_embedding_model()
 
 # Initialize ChromaDB
 vector_store = Chroma(
     collection_name="classroom_docs",
     embedding_function=embedding_model,
-    persist_directory="./chroma_db"  # Saves to the same folder structure
+    persist_directory=CHROMA_DIR  # Saves to the same folder structure
 )
 
 # --- Auth Routes (Same as before) ---
 
 @router.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -74,9 +86,9 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/register", response_model=User)
-async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
-    user_check = db.query(models.User).filter(models.User.username == user_data.username).first()
-    if user_check:
+async def register_user(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
+    user_check = await db.execute(select(models.User).where(models.User.username == user_data.username))
+    if user_check.scalars().first():
         raise HTTPException(status_code=400, detail="Username already Registered")
     
     hashed_pw = get_password_hash(user_data.password)
@@ -89,8 +101,7 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
         disabled=False
     )
     db.add(new_user_entry)
-    db.commit()
-    db.refresh(new_user_entry)
+    await db.commit()
     return new_user_entry
 
 @router.get("/users/me/", response_model=User)
@@ -99,11 +110,29 @@ async def read_users_me(current_user: models.User = Depends(get_current_active_u
 
 # --- Classroom Routes (Same as before) ---
 
+# Async sessions can't lazy-load, so the student roster of the response is loaded up front
+async def get_classroom_with_students(db: AsyncSession, classroom_id: int, **filters):
+    result = await db.execute(
+        select(models.Classroom)
+        .options(selectinload(models.Classroom.students))
+        .filter_by(id=classroom_id, **filters)
+    )
+    return result.scalars().first()
+
+async def is_enrolled(db: AsyncSession, user_id: int, classroom_id: int) -> bool:
+    result = await db.execute(
+        select(models.classroom_students.c.user_id).where(
+            models.classroom_students.c.user_id == user_id,
+            models.classroom_students.c.classroom_id == classroom_id
+        )
+    )
+    return result.first() is not None
+
 @router.post("/classrooms/", response_model=Classroom)
 async def create_classroom(
     classroom: ClassroomCreate, 
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.role != "teacher":
         raise HTTPException(status_code=403, detail="Only teachers can create classrooms")
@@ -111,29 +140,28 @@ async def create_classroom(
     new_classroom = models.Classroom(
         name=classroom.name,
         description=classroom.description,
-        teacher_id=current_user.id
+        teacher_id=current_user.id,
+        students=[]  # loaded (empty), so the response never lazy-loads it
     )
     db.add(new_classroom)
-    db.commit()
-    db.refresh(new_classroom)
+    await db.commit()
     return new_classroom
 
 @router.post("/classrooms/{classroom_id}/join", response_model=Classroom)
 async def join_classroom(
     classroom_id: int,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.role != "student":
         raise HTTPException(status_code=403, detail="Only students can join classrooms")
         
-    classroom = db.query(models.Classroom).filter(models.Classroom.id == classroom_id).first()
+    classroom = await get_classroom_with_students(db, classroom_id)
     if not classroom:
         raise HTTPException(status_code=404, detail="Classroom not found")
 
     classroom.students.append(current_user)
-    db.commit()
-    db.refresh(classroom)
+    await db.commit()
     return classroom
 
 # --- Document & Vector Routes (UPDATED) ---
@@ -142,7 +170,7 @@ def upload_document_and_vectorize(
     classroom_id: int,
     file: UploadFile = File(...),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_sync_db)
 ):
     # 1️⃣ Authorization
     if current_user.role != "teacher":
@@ -177,7 +205,7 @@ def upload_document_and_vectorize(
         f"document_{doc.id}/original_{file.filename}"
     )
 
-    minio_client.put_object(
+    storage_client.put_object(
         bucket_name=BUCKET_NAME,
         object_name=object_path,
         data=file.file,
@@ -193,36 +221,27 @@ def upload_document_and_vectorize(
     temp_filename = f"temp_{doc.id}_{file.filename}"
 
     with open(temp_filename, "wb") as temp_file:
-        response = minio_client.get_object(BUCKET_NAME, object_path)
+        response = storage_client.get_object(BUCKET_NAME, object_path)
         for chunk in response.stream(32 * 1024):
             temp_file.write(chunk)
 
     try:
         # 6️⃣ Load document
-        if file.filename.endswith(".pdf"):
-            loader = PyPDFLoader(temp_filename)
-        else:
-            loader = TextLoader(temp_filename, encoding="utf-8")
-
-        documents = loader.load()
+        documents = load_pages(temp_filename, file.filename)
 
         # 7️⃣ Split into chunks
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
-        )
-        chunks = splitter.split_documents(documents)
+        chunks = split_pages(documents)
 
-        # 8️⃣ Add metadata
-        for chunk in chunks:
-            chunk.metadata = {
-                "document_id": doc.id,
-                "classroom_id": classroom_id,
-                "filename": file.filename
-            }
+        # 8️⃣ Keep the extracted text next to the original, so re-indexing never re-parses it
+        records = chunk_records(chunks, doc.id, classroom_id, file.filename)
+        save_artifacts(storage_client, BUCKET_NAME, classroom_id, doc.id, page_records(documents), records)
 
-        # 9️⃣ Store in ChromaDB
-        vector_store.add_documents(chunks)
+        # 9️⃣ Store in ChromaDB (stable ids: a re-index replaces these vectors)
+        vector_store.add_texts(
+            texts=[r["text"] for r in records],
+            metadatas=[r["metadata"] for r in records],
+            ids=[r["id"] for r in records]
+        )
 
         doc.is_processed = True
         db.commit()
@@ -238,13 +257,13 @@ def upload_document_and_vectorize(
 async def get_document_vectors_status(
     document_id: int,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Since a document is now split into multiple chunks, we can't return 
     a single vector. Instead, we query Chroma to confirm chunks exist.
     """
-    document = db.query(models.Document).filter(models.Document.id == document_id).first()
+    document = await db.get(models.Document, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
         
@@ -263,23 +282,22 @@ async def get_document_vectors_status(
 async def generate_and_store_lesson(
     request: ChatRequest,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # ... (API Key check and LLM setup remain the same) ...
-    google_api_key = os.getenv("AI_API_KEY")
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash-lite",
-        google_api_key=google_api_key,
-        temperature=0.4
-    )
+    llm = get_llm(temperature=0.4)
 
-    # --- THE FIX: ADD SEARCH KWARGS WITH FILTER ---
-    retriever = vector_store.as_retriever(
-        search_kwargs={
-            "k": 4,
-            "filter": {"classroom_id": request.classroom_id}  # <--- This enforces the scope
-        }
-    )
+    # --- THE FIX: FILTER THE SEARCH BY CLASSROOM ---
+    # Embedding and search run as separate steps so each stage can be timed
+    async def retrieve_context(question: str):
+        with stage("generate_lesson", "query_embedding"):
+            query_vector = await embedding_model.aembed_query(question)
+        with stage("generate_lesson", "chroma_search"):
+            return await vector_store.asimilarity_search_by_vector(
+                query_vector,
+                k=4,
+                filter={"classroom_id": request.classroom_id}  # <--- This enforces the scope
+            )
     
     # ... (The rest of the Prompt and Chain code remains exactly the same) ...
     
@@ -307,33 +325,35 @@ async def generate_and_store_lesson(
     
     prompt = ChatPromptTemplate.from_template(template)
 
-    # The rest of your chain code is correct:
-    chain = (
-        {
-            "context": retriever, 
-            "question": RunnablePassthrough(), 
-            "name": lambda x: request.student_name, 
-            "interest": lambda x: request.student_interest, 
-            "grade": lambda x: request.student_grade, 
-            "topic": lambda x: request.topic
-        }
-        | prompt
-        | llm
-        | StrOutputParser()
-    )
+    chain = prompt | llm | StrOutputParser()
+
+    async def generate(question: str) -> str:
+        context = await retrieve_context(question)
+        with stage("generate_lesson", "llm"):
+            return await chain.ainvoke({
+                "context": context,
+                "question": question,
+                "name": request.student_name,
+                "interest": request.student_interest,
+                "grade": request.student_grade,
+                "topic": request.topic
+            })
 
     try:
         # Check if the user is actually IN this classroom (Security Check)
         # (Optional but recommended)
-        student_in_class = db.query(models.classroom_students).filter_by(
-            user_id=current_user.id, 
-            classroom_id=request.classroom_id
-        ).first()
+        with stage("generate_lesson", "enrollment_query"):
+            student_in_class = await is_enrolled(db, current_user.id, request.classroom_id)
         
         if not student_in_class:
              raise HTTPException(status_code=403, detail="You are not enrolled in this classroom.")
 
-        generated_content = chain.invoke(request.question)
+        # Identical in-flight requests (e.g. a whole class asking the same
+        # question) share one generation; each still gets its own lesson row
+        generated_content = await lesson_flight.do(
+            make_key(request.model_dump()),
+            lambda: generate(request.question)
+        )
         
         new_lesson = models.GeneratedLesson(
             topic=request.topic,
@@ -341,9 +361,9 @@ async def generate_and_store_lesson(
             student_id=current_user.id
         )
         
-        db.add(new_lesson)
-        db.commit()
-        db.refresh(new_lesson)
+        with stage("generate_lesson", "commit"):
+            db.add(new_lesson)
+            await db.commit()
         
         return new_lesson
 
@@ -351,71 +371,206 @@ async def generate_and_store_lesson(
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 @router.get("/chat/lessons", response_model=List[GeneratedLessonResponse])
 async def get_student_lessons(
+    response: Response,
+    page: PageParams = Depends(),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Retrieve history of generated lessons for the current user."""
-    return db.query(models.GeneratedLesson).filter(
-        models.GeneratedLesson.student_id == current_user.id
-    ).all()
+    """Retrieve history of generated lessons for the current user, newest first (paginated)."""
+    query = select(models.GeneratedLesson).where(models.GeneratedLesson.student_id == current_user.id)
+    result = await db.execute(paginate(query, models.GeneratedLesson.id, page, descending=True))
+    return next_page(response, result.scalars().all(), page)
 
 @router.get("/chat/lessons/{lesson_id}", response_model=GeneratedLessonResponse)
 async def get_lesson_detail(
     lesson_id: int,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Retrieve a specific lesson."""
-    lesson = db.query(models.GeneratedLesson).filter(
+    result = await db.execute(select(models.GeneratedLesson).where(
         models.GeneratedLesson.id == lesson_id,
         models.GeneratedLesson.student_id == current_user.id
-    ).first()
+    ))
+    lesson = result.scalars().first()
     
     if not lesson:
         raise HTTPException(status_code=404, detail="Lesson not found")
     return lesson
 
+# ==========================================
+#      BASELINE (PRE-GENERATED) LESSONS
+# ==========================================
+
+@router.get("/lessons/baseline", response_model=List[BaselineLessonResponse])
+async def get_baseline_lessons(
+    topic: Optional[str] = None,
+    grade: Optional[str] = None,
+    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Serve lessons pre-generated off-peak from the syllabus (no LLM call)."""
+    query = select(models.BaselineLesson)
+    if topic:
+        query = query.where(models.BaselineLesson.topic == topic)
+    if grade:
+        query = query.where(models.BaselineLesson.grade_level == grade)
+    result = await db.execute(query.order_by(models.BaselineLesson.topic))
+    return result.scalars().all()
+
+@router.post("/lessons/baseline/{baseline_id}/personalize", response_model=GeneratedLessonResponse)
+async def personalize_baseline_lesson(
+    baseline_id: int,
+    request: PersonalizeRequest,
+    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Personalize a pre-generated lesson, using it as the draft instead of the raw document."""
+    baseline = await db.get(models.BaselineLesson, baseline_id)
+    if not baseline:
+        raise HTTPException(status_code=404, detail="Baseline lesson not found")
+
+    chain = build_personalize_chain()
+
+    try:
+        generated_content = await chain.ainvoke({
+            "name": request.student_name,
+            "grade": request.student_grade,
+            "interest": request.student_interest,
+            "full_text": baseline.content
+        })
+
+        new_lesson = models.GeneratedLesson(
+            topic=baseline.topic,
+            content=generated_content,
+            student_id=current_user.id
+        )
+        db.add(new_lesson)
+        await db.commit()
+
+        return new_lesson
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Personalization failed: {str(e)}")
+
 # ==========================================
 #      DOCUMENT DOWNLOAD ROUTES
 # ==========================================
 
+# "redirect": send the browser to MinIO with a short-lived presigned URL (default)
+# "proxy": serve the bytes from the API, for deployments where MinIO isn't reachable by browsers
+DOWNLOAD_MODE = os.getenv("DOWNLOAD_MODE", "redirect")
+
 @router.get("/documents/{document_id}/download")
 async def download_original_document(
     document_id: int,
+    request: Request,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Downloads the original file from MinIO.
+    Downloads the original file. By default the browser is redirected to MinIO;
+    with DOWNLOAD_MODE=proxy the API serves it with Range (206) and ETag (304) support.
     """
     # 1. Get Document Info
-    document = db.query(models.Document).filter(models.Document.id == document_id).first()
+    result = await db.execute(
+        select(models.Document)
+        .options(selectinload(models.Document.classroom))
+        .where(models.Document.id == document_id)
+    )
+    document = result.scalars().first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    # 2. Check Permissions (Optional: Check if user is in the classroom)
-    # For now, we assume if they are logged in, they can access (expand logic as needed)
-    
-    # 3. Stream from MinIO
+    # 2. Check Permissions: the classroom's teacher or an enrolled student
+    if current_user.id != document.classroom.teacher_id:
+        if not await is_enrolled(db, current_user.id, document.classroom_id):
+            raise HTTPException(status_code=403, detail="Not a member of this classroom")
+
+    # Sending the bytes can take minutes: give the DB connection back to the pool first
+    await db.close()
+
+    disposition = f'attachment; filename="{document.filename}"'
+    media_type = document.mime_type or "application/octet-stream"
+
+    # 3a. Let MinIO serve the bytes (it handles Range and ETag itself)
+    if DOWNLOAD_MODE == "redirect":
+        url = await download_url_cache.aget(document.storage_path, response_headers={
+            "response-content-disposition": disposition,
+            "response-content-type": media_type,
+        })
+        return RedirectResponse(url, status_code=307)
+
+    # 3b. Serve from here, but never send bytes the client already has
     try:
-        response = minio_client.get_object(document.bucket_name, document.storage_path)
-        
-        return StreamingResponse(
-            response.stream(32 * 1024),
-            media_type=document.mime_type or "application/octet-stream",
-            headers={"Content-Disposition": f'attachment; filename="{document.filename}"'}
-        )
+        stat = await storage.stat_object(document.bucket_name, document.storage_path)
+    except STORAGE_ERRORS:
+        raise HTTPException(status_code=404, detail="File not found in storage")
+
+    etag = f'"{stat.etag}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": disposition,
+        "Cache-Control": "private, no-cache",  # always revalidate, usually a 304
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = parse_range(request.headers.get("range"), stat.size)
+    try:
+        if byte_range:
+            start, end = byte_range
+            response = await storage.open_object(
+                document.bucket_name, document.storage_path, offset=start, length=end - start + 1
+            )
+            headers["Content-Range"] = f"bytes {start}-{end}/{stat.size}"
+            headers["Content-Length"] = str(end - start + 1)
+            status_code = 206
+        else:
+            response = await storage.open_object(document.bucket_name, document.storage_path)
+            headers["Content-Length"] = str(stat.size)
+            status_code = 200
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"File retrieval error: {str(e)}")
+
+    return StreamingResponse(
+        storage.stream_object(response),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers
+    )
+@router.get("/storage/{bucket_name}/{object_name:path}")
+async def get_local_object(bucket_name: str, object_name: str, request: Request):
+    """
+    Serves presigned URLs of the local storage backend (STORAGE_BACKEND=local).
+    FileResponse handles Range requests and uses zero-copy sends where the server supports them.
+    """
+    if not isinstance(storage_client, LocalStorage):
+        raise HTTPException(status_code=404, detail="Not found")
+    params = dict(request.query_params)
+    try:
+        valid = storage_client.verify(bucket_name, object_name, params)
+        path = storage_client.file_path(bucket_name, object_name)
+    except ValueError:
+        valid = False
+    if not valid:
+        raise HTTPException(status_code=403, detail="Invalid or expired signature")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Object not found")
+
+    headers = {"Content-Disposition": params["disposition"]} if params.get("disposition") else None
+    return FileResponse(path, media_type=params.get("type"), headers=headers)
 @router.post("/documents/{document_id}/personalize", response_model=GeneratedLessonResponse)
 async def personalize_entire_document(
     document_id: int,
     request: PersonalizeRequest,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # 1. Verify Document Access
-    doc = db.query(models.Document).filter(models.Document.id == document_id).first()
+    with stage("personalize", "document_query"):
+        doc = await db.get(models.Document, document_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
@@ -424,10 +579,11 @@ async def personalize_entire_document(
 
     # 2. Retrieve ALL chunks for this document from Chroma
     # We filter by metadata "document_id" which we saved during upload
-    results = vector_store.get(
-        where={"document_id": document_id},
-        include=["documents"]  # We only need the text content
-    )
+    with stage("personalize", "chroma_get"):
+        results = vector_store.get(
+            where={"document_id": document_id},
+            include=["documents"]  # We only need the text content
+        )
 
     doc_texts = results.get("documents", [])
     
@@ -439,156 +595,335 @@ async def personalize_entire_document(
     # Gemini 1.5/2.5 Flash has a huge context window, so this usually works fine for standard chapters/PDFs.
     full_text = "\n\n".join(doc_texts)
 
-    # 4. Setup LLM
-    google_api_key = os.getenv("AI_API_KEY")
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash-lite", # Ensure you use a model with large context
-        google_api_key=google_api_key,
-        temperature=0.5
-    )
-
-    # 5. Create the "Rewrite" Prompt
-    template = """
-    You are an expert educational content creator.
-    
-    Goal: Rewrite the following entire educational text to make it personalized for a student.
-    
-    Student Profile:
-    - Name: {name}
-    - Grade: {grade}
-    - Interest: {interest}
-    
-    Instructions:
-    1. Read the provided text below.
-    2. Rewrite the content to match the student's reading level ({grade}).
-    3. Explain the core concepts using analogies, metaphors, and examples related to their interest: "{interest}".
-    4. Maintain the original educational facts but change the tone and delivery style.
-    
-    Original Text:
-    {full_text}
-    
-    Personalized Version:
-    """
-
-    prompt = ChatPromptTemplate.from_template(template)
-
-    # 6. Execute Chain
-    chain = prompt | llm | StrOutputParser()
+    # 4. Setup LLM + "Rewrite" prompt (shared with the classroom batch job)
+    chain = build_personalize_chain()
 
     try:
-        generated_content = chain.invoke({
-            "name": request.student_name,
-            "grade": request.student_grade,
-            "interest": request.student_interest,
-            "full_text": full_text
-        })
+        with stage("personalize", "llm"):
+            generated_content = await chain.ainvoke({
+                "name": request.student_name,
+                "grade": request.student_grade,
+                "interest": request.student_interest,
+                "full_text": full_text
+            })
 
-        # 7. Save and Return
+        # 5. Save and Return
         new_lesson = models.GeneratedLesson(
-            topic=f"Full Rewrite: {doc.filename}",
+            topic=personalized_topic(doc.filename),
             content=generated_content,
             student_id=current_user.id
         )
         
-        db.add(new_lesson)
-        db.commit()
-        db.refresh(new_lesson)
+        with stage("personalize", "commit"):
+            db.add(new_lesson)
+            await db.commit()
         
         return new_lesson
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Personalization failed: {str(e)}")
+@router.post(
+    "/classrooms/{classroom_id}/documents/{document_id}/personalize_all",
+    response_model=BatchPersonalizeResponse
+)
+async def personalize_document_for_classroom(
+    classroom_id: int,
+    document_id: int,
+    request: BatchPersonalizeRequest,
+    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Enqueues ONE background job that personalizes a document for every
+    student enrolled in the classroom.
+    """
+    # 1. Only the classroom's teacher can run a batch
+    if current_user.role != "teacher":
+        raise HTTPException(status_code=403, detail="Only teachers can personalize for a classroom")
+
+    classroom = await get_classroom_with_students(db, classroom_id, teacher_id=current_user.id)
+    if not classroom:
+        raise HTTPException(status_code=404, detail="Classroom not found")
+
+    result = await db.execute(select(models.Document).filter_by(id=document_id, classroom_id=classroom_id))
+    doc = result.scalars().first()
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    students = [
+        {
+            "id": student.id,
+            "name": student.full_name or student.username,
+            "interest": request.student_interests.get(student.id, request.default_interest),
+        }
+        for student in classroom.students
+    ]
+    if not students:
+        raise HTTPException(status_code=400, detail="No students enrolled in this classroom")
+
+    # 2. Load the document text ONCE for the whole class
+    results = vector_store.get(
+        where={"document_id": document_id},
+        include=["documents"]
+    )
+    doc_texts = results.get("documents", [])
+    if not doc_texts:
+        raise HTTPException(status_code=404, detail="No processed text found for this document")
+
+    full_text = "\n\n".join(doc_texts)
+
+    # 3. Enqueue the batch job
+    job_id = str(uuid.uuid4())
+    ingestion_queue.enqueue_call(
+        func='worker.personalize_classroom_task',
+        args=(full_text, personalized_topic(doc.filename), request.student_grade, students),
+        job_id=job_id,
+        timeout=120 + 60 * len(students),
+        meta={"classroom_id": classroom_id, "document_id": document_id, "student_count": len(students)},
+    )
+
+    return BatchPersonalizeResponse(
+        job_id=job_id,
+        classroom_id=classroom_id,
+        document_id=document_id,
+        student_count=len(students),
+        status="queued"
+    )
+@router.get(
+    "/classrooms/{classroom_id}/documents/{document_id}/personalize_all/{job_id}",
+    response_model=BatchPersonalizeResponse
+)
+async def check_batch_personalization(
+    classroom_id: int,
+    document_id: int,
+    job_id: str,
+    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Checks the status of a classroom-wide personalization job."""
+    result = await db.execute(select(models.Classroom).filter_by(id=classroom_id, teacher_id=current_user.id))
+    classroom = result.scalars().first()
+    if not classroom:
+        raise HTTPException(status_code=404, detail="Classroom not found")
+
+    job = ingestion_queue.fetch_job(job_id)
+    if not job or job.meta.get("classroom_id") != classroom_id or job.meta.get("document_id") != document_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    response = BatchPersonalizeResponse(
+        job_id=job_id,
+        classroom_id=classroom_id,
+        document_id=document_id,
+        student_count=job.meta.get("student_count", 0),
+        status=job.get_status()
+    )
+    if job.is_finished and job.result:
+        response.status = job.result.get("status", "finished")
+        response.lessons_created = job.result.get("lessons_created")
+        response.failed_student_ids = job.result.get("failed_student_ids", [])
+    return response
+# --- Classroom listings ---
+# Each comes in two variants:
+#   /classrooms/<listing>          with the student roster (one extra query for all rosters)
+#   /classrooms/<listing>/summary  student count instead of the roster, a single query
+
+def enrolled_in(user_id: int):
+    """EXISTS clause: the user is enrolled in the Classroom of the row (negate it for an anti-join)."""
+    # Aliased, so it stays a subquery when the outer query joins classroom_students too
+    enrollment = models.classroom_students.alias("enrollment")
+    return exists().where(
+        enrollment.c.classroom_id == models.Classroom.id,
+        enrollment.c.user_id == user_id
+    )
+
+async def list_classrooms(db: AsyncSession, *criteria, page: PageParams | None = None):
+    query = (
+        select(models.Classroom)
+        .options(selectinload(models.Classroom.students))
+        .where(*criteria)
+    )
+    result = await db.execute(paginate(query, models.Classroom.id, page))
+    return result.scalars().all()
+
+async def list_classroom_summaries(db: AsyncSession, *criteria, page: PageParams | None = None):
+    query = (
+        select(models.Classroom, func.count(models.classroom_students.c.user_id))
+        .outerjoin(models.classroom_students, models.classroom_students.c.classroom_id == models.Classroom.id)
+        .where(*criteria)
+        .group_by(models.Classroom.id)
+    )
+    result = await db.execute(paginate(query, models.Classroom.id, page))
+    classrooms = []
+    for classroom, student_count in result.all():
+        classroom.student_count = student_count
+        classrooms.append(classroom)
+    return classrooms
+
 @router.get("/classrooms/me", response_model=List[Classroom])
 async def get_my_classrooms(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Fetch all classrooms where the current user is the teacher
-    classrooms = db.query(models.Classroom).filter(
-        models.Classroom.teacher_id == current_user.id
-    ).all()
-    return classrooms
+    return await list_classrooms(db, models.Classroom.teacher_id == current_user.id)
+@router.get("/classrooms/me/summary", response_model=List[ClassroomSummary])
+async def get_my_classrooms_summary(
+    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await list_classroom_summaries(db, models.Classroom.teacher_id == current_user.id)
 @router.get("/classrooms/enrolled", response_model=List[Classroom])
 async def get_enrolled_classrooms(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    # SQLAlchemy magic: fetch classrooms linked to this student
-    return current_user.classrooms_enrolled
+    # Classrooms linked to this student through the association table
+    return await list_classrooms(db, enrolled_in(current_user.id))
+@router.get("/classrooms/enrolled/summary", response_model=List[ClassroomSummary])
+async def get_enrolled_classrooms_summary(
+    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await list_classroom_summaries(db, enrolled_in(current_user.id))
 
 @router.get("/classrooms/{classroom_id}/documents", response_model=List[DocumentResponse])
 async def get_classroom_documents(
     classroom_id: int,
+    response: Response,
+    page: PageParams = Depends(),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # 1. Check if classroom exists
-    classroom = db.query(models.Classroom).filter(models.Classroom.id == classroom_id).first()
+    classroom = await db.get(models.Classroom, classroom_id)
     if not classroom:
         raise HTTPException(status_code=404, detail="Classroom not found")
         
     # 2. Security: Ensure student is actually in this class (or is the teacher)
-    if current_user not in classroom.students and current_user.id != classroom.teacher_id:
+    if current_user.id != classroom.teacher_id and not await is_enrolled(db, current_user.id, classroom_id):
         raise HTTPException(status_code=403, detail="Not a member of this classroom")
         
-    return classroom.documents
+    query = select(models.Document).where(models.Document.classroom_id == classroom_id)
+    result = await db.execute(paginate(query, models.Document.id, page))
+    return next_page(response, result.scalars().all(), page)
 @router.get("/classrooms/available", response_model=List[Classroom])
 async def get_available_classrooms(
+    response: Response,
+    page: PageParams = Depends(),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    # Fetch all classrooms
-    all_classrooms = db.query(models.Classroom).all()
-    
-    # Filter out classrooms the user is already enrolled in
-    # (using the classrooms_enrolled relationship from models.py)
-    enrolled_ids = {c.id for c in current_user.classrooms_enrolled}
-    
-    return [c for c in all_classrooms if c.id not in enrolled_ids]
+    # Classrooms the user is not enrolled in (anti-join, filtered by the database), paginated
+    classrooms = await list_classrooms(db, ~enrolled_in(current_user.id), page=page)
+    return next_page(response, classrooms, page)
+@router.get("/classrooms/available/summary", response_model=List[ClassroomSummary])
+async def get_available_classrooms_summary(
+    response: Response,
+    page: PageParams = Depends(),
+    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    classrooms = await list_classroom_summaries(db, ~enrolled_in(current_user.id), page=page)
+    return next_page(response, classrooms, page)
+def playlist_url(request: Request, job_id: str) -> str:
+    """Absolute URL of a video's HLS playlist, with its own access token."""
+    url = request.url_for("get_video_playlist", job_id=job_id)
+    return str(url.include_query_params(token=create_playlist_token(job_id)))
 @router.get("/chat/video_status/{job_id}", response_model=VideoStatusResponse)
 async def check_video_status(
     job_id: str,
+    request: Request,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Checks the status of a video generation job.
     """
-    video_record = db.query(models.GeneratedVideo).filter(models.GeneratedVideo.job_id == job_id).first()
+    result = await db.execute(select(models.GeneratedVideo).where(models.GeneratedVideo.job_id == job_id))
+    video_record = result.scalars().first()
     if not video_record:
         raise HTTPException(status_code=404, detail="Video not found")
 
-    # If DB says it's done, just generate the URL and return
+    # The worker records the outcome itself, so this is a single row lookup
+    if video_record.playlist_path:
+        video_record.playlist_url = playlist_url(request, job_id)
     if video_record.status == "completed" and video_record.minio_path:
-        video_record.video_url = minio_client.presigned_get_object(BUCKET_NAME, video_record.minio_path)
+        video_record.video_url = await url_cache.aget(video_record.minio_path)
+        if video_record.hq_minio_path:
+            video_record.hq_video_url = await url_cache.aget(video_record.hq_minio_path)
+    elif video_record.status == "failed":
+        video_record.message = video_record.error
+
+    return video_record
+@router.post("/chat/video_cancel/{job_id}", response_model=VideoStatusResponse)
+async def cancel_video_job(
+    job_id: str,
+    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Cancels a video job: queued jobs are dropped, running renders are killed.
+    """
+    result = await db.execute(select(models.GeneratedVideo).where(
+        models.GeneratedVideo.job_id == job_id,
+        models.GeneratedVideo.user_id == current_user.id
+    ))
+    video_record = result.scalars().first()
+    if not video_record:
+        raise HTTPException(status_code=404, detail="Video not found")
+    if video_record.status in ("completed", "failed", "cancelled"):
         return video_record
 
-    # If not done, ask Redis what's happening
-    try:
-        job = queue.fetch_job(job_id)
-        if job and job.is_finished:
-            result = job.result
-            if result.get("status") == "success":
-                # UPDATE DB! This makes it permanent.
-                video_record.status = "completed"
-                video_record.minio_path = result["minio_path"]
-                db.commit()
-                
-                # Generate URL
-                video_record.video_url = minio_client.presigned_get_object(BUCKET_NAME, result["minio_path"])
-            else:
-                video_record.status = "failed"
-                db.commit()
-    except Exception as e:
-        print(f"Error syncing job: {e}")
+    # The render executor polls this flag while the job renders
+    redis_conn.set(cancel_key(job_id), 1, ex=3600)
+    redis_conn.set(cancel_key(f"{job_id}-hq"), 1, ex=3600)
+    job = interactive_queue.fetch_job(job_id)
+    if job and job.get_status() == "queued":
+        job.cancel()
 
+    video_record.status = "cancelled"
+    await db.commit()
+    publish_progress(redis_conn, job_id, "cancelled")
     return video_record
+@router.get("/chat/video_events/{job_id}")
+async def stream_video_events(
+    job_id: str,
+    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Pushes the progress of a video job as Server-Sent Events
+    (started, latex_extracted, code_generated, rendering, uploading, completed, ...),
+    so the browser no longer polls /chat/video_status.
+    """
+    result = await db.execute(select(models.GeneratedVideo).where(
+        models.GeneratedVideo.job_id == job_id,
+        models.GeneratedVideo.user_id == current_user.id
+    ))
+    video_record = result.scalars().first()
+    # The stream stays open until the job ends: don't hold a DB connection for it
+    await db.close()
+    if not video_record:
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # no proxy buffering
+
+    # Nothing left to wait for (the live events may have expired already)
+    if video_record.status in ("completed", "failed", "cancelled") and video_record.hq_status != "queued":
+        event = {"job_id": job_id, "stage": video_record.status}
+        return StreamingResponse(iter([format_sse(event)]), media_type="text/event-stream", headers=headers)
+
+    return StreamingResponse(
+        stream_progress(progress_hub, job_id),
+        media_type="text/event-stream",
+        headers=headers
+    )
 @router.post("/generate/from-doc")
 async def generate_from_doc(
     file: UploadFile = File(None),
     text: str = Form(None),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Upload a text/tex file OR provide a raw string.
@@ -623,14 +958,7 @@ async def generate_from_doc(
     if not content.strip():
         raise HTTPException(status_code=400, detail="Content is empty.")
 
-    # 2. Enqueue the new specific task using enqueue_call so args are passed positionally
-    job = queue.enqueue_call(
-        func='worker.process_doc_to_video_task',
-        args=(content, job_id),
-        job_id=job_id,
-        timeout=600,
-    )
-
+    # 2. Create the row first: the worker writes its progress and result into it
     new_video = models.GeneratedVideo(
         job_id=job_id,
         topic=topic_name,
@@ -638,24 +966,77 @@ async def generate_from_doc(
         user_id=current_user.id
     )
     db.add(new_video)
-    db.commit()
-    db.refresh(new_video)
+    await db.commit()
+
+    # 3. Enqueue the new specific task using enqueue_call so args are passed positionally
+    interactive_queue.enqueue_call(
+        func='worker.process_doc_to_video_task',
+        args=(content, job_id),
+        job_id=job_id,
+        timeout=600,
+        on_failure=Callback('worker.video_job_failed'),
+    )
 
     return new_video
 @router.get("/videos/mine", response_model=List[GeneratedVideoResponse])
 async def get_my_videos(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    # Fetch all videos for this student
-    videos = db.query(models.GeneratedVideo).filter(
-        models.GeneratedVideo.user_id == current_user.id
-    ).order_by(models.GeneratedVideo.created_at.desc()).all()
+    # One page of this student's videos, newest first (ids grow with created_at)
+    query = select(models.GeneratedVideo).where(models.GeneratedVideo.user_id == current_user.id)
+    result = await db.execute(paginate(query, models.GeneratedVideo.id, page, descending=True))
+    videos = next_page(response, result.scalars().all(), page)
 
-    # Generate fresh URLs for every completed video
+    # Signed URLs for every completed video of the page, in one batch (reused until close to expiry)
+    paths = [v.minio_path for v in videos if v.status == "completed" and v.minio_path]
+    paths += [v.hq_minio_path for v in videos if v.hq_minio_path]
+    urls = await url_cache.aget_many(paths)
     for v in videos:
         if v.status == "completed" and v.minio_path:
-            # This generates a link valid for 7 days (default)
-            v.video_url = minio_client.presigned_get_object(BUCKET_NAME, v.minio_path)
+            v.video_url = urls[v.minio_path]
+        if v.hq_minio_path:
+            v.hq_video_url = urls[v.hq_minio_path]
+        if v.playlist_path:
+            v.playlist_url = playlist_url(request, v.job_id)
     
-    return videos
\ No newline at end of file
+    return videos
+@router.get("/videos/{job_id}/playlist.m3u8", name="get_video_playlist")
+async def get_video_playlist(
+    job_id: str,
+    token: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Serves a video's HLS playlist with every segment rewritten to a presigned
+    MinIO URL. Authorized by the token in the URL, since players can't send headers.
+    """
+    if not verify_playlist_token(token, job_id):
+        raise HTTPException(status_code=403, detail="Invalid or expired playlist token")
+
+    result = await db.execute(select(models.GeneratedVideo).where(models.GeneratedVideo.job_id == job_id))
+    video_record = result.scalars().first()
+    if not video_record or not video_record.playlist_path:
+        raise HTTPException(status_code=404, detail="Playlist not found")
+
+    try:
+        playlist = (await storage.get_object_bytes(BUCKET_NAME, video_record.playlist_path)).decode("utf-8")
+    except STORAGE_ERRORS:
+        raise HTTPException(status_code=404, detail="Playlist not found")
+
+    # Segment lines are names relative to the playlist
+    prefix = video_record.playlist_path.rsplit("/", 1)[0] + "/"
+    lines = playlist.splitlines()
+    urls = await url_cache.aget_many(prefix + line for line in lines if line and not line.startswith("#"))
+    lines = [line if not line or line.startswith("#") else urls[prefix + line] for line in lines]
+
+    # A live (unfinished) playlist must be re-fetched by the player
+    finished = "#EXT-X-ENDLIST" in playlist
+    return Response(
+        content="\n".join(lines) + "\n",
+        media_type="application/vnd.apple.mpegurl",
+        headers={"Cache-Control": "private, max-age=3600" if finished else "no-cache"}
+    )
\ No newline at end of file
@@ -0,0 +1,105 @@
+# backend/scene_validator.py
+# Checks LLM-generated Manim code before we spend a full render on it:
+#   1. static checks on the AST (MathScene(Scene) contract + banned constructs)
+#   2. a dry run that only renders the last frame at a tiny resolution,
+#      which still compiles every MathTex, so LaTeX errors surface in seconds
+import os
+import ast
+import sys
+from render_executor import render_executor, warm_render_pool, RenderError, RENDER_MODE
+
+DRY_RUN_TIMEOUT = int(os.getenv("DRY_RUN_TIMEOUT", 60))
+DRY_RUN_RESOLUTION = (160, 90)
+
+# Characters that mean a Tex(...) string actually contains math
+_MATH_CHARS = ("$", "\\", "^", "_")
+
+
+def _call_name(node: ast.Call) -> str | None:
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+
+def _string_args(node: ast.Call):
+    for arg in node.args:
+        if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+            yield arg.value
+
+
+def validate_scene_code(code: str) -> list[str]:
+    """Returns a list of problems (empty if the code passes)."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return [f"SyntaxError on line {e.lineno}: {e.msg}"]
+
+    errors = []
+
+    # 1. Contract: exactly one `class MathScene(Scene)` with a construct(self) method
+    scenes = [n for n in tree.body if isinstance(n, ast.ClassDef) and n.name == "MathScene"]
+    if len(scenes) != 1:
+        errors.append("Must define exactly one top-level class MathScene(Scene).")
+    else:
+        scene = scenes[0]
+        bases = [b.id if isinstance(b, ast.Name) else getattr(b, "attr", None) for b in scene.bases]
+        if "Scene" not in bases:
+            errors.append("MathScene must inherit from Scene.")
+        methods = {n.name for n in scene.body if isinstance(n, ast.FunctionDef)}
+        if "construct" not in methods:
+            errors.append("MathScene must define construct(self).")
+
+    # Names bound to MathTex objects, e.g. `equation = MathTex(...)`
+    mathtex_names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Call) and _call_name(node.value) == "MathTex":
+            mathtex_names.update(t.id for t in node.targets if isinstance(t, ast.Name))
+
+    # 2. Banned constructs from the prompt's CRITICAL STABILITY RULES
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            name = _call_name(node)
+            if any(kw.arg == "substrings_to_isolate" for kw in node.keywords):
+                errors.append(f"Line {node.lineno}: DO NOT use substrings_to_isolate.")
+            if name == "Tex" and any(c in s for s in _string_args(node) for c in _MATH_CHARS):
+                errors.append(f"Line {node.lineno}: NEVER use Tex for math expressions, use MathTex.")
+        elif isinstance(node, ast.Subscript):
+            target = node.value
+            indexes_mathtex = (
+                (isinstance(target, ast.Name) and target.id in mathtex_names)
+                or (isinstance(target, ast.Call) and _call_name(target) == "MathTex")
+            )
+            if indexes_mathtex:
+                errors.append(f"Line {node.lineno}: NEVER access MathTex using numeric indices or slices.")
+
+    return errors
+
+
+def dry_run_scene(job_id: str, script_path: str, work_dir: str) -> list[str]:
+    """
+    Renders only the last frame at a tiny resolution. Returns a list of
+    problems (empty if Manim + LaTeX succeeded).
+    """
+    media_dir = os.path.join(work_dir, "dry_run")
+    log_path = os.path.join(work_dir, "dry_run.log")
+    width, height = DRY_RUN_RESOLUTION
+
+    try:
+        if RENDER_MODE == "warm":
+            warm_render_pool.render(
+                f"{job_id}-dry-run", script_path, media_dir, "low_quality", log_path,
+                config_overrides={"save_last_frame": True, "pixel_width": width, "pixel_height": height},
+                timeout=DRY_RUN_TIMEOUT,
+            )
+        else:
+            cmd = [
+                sys.executable, "-m", "manim", "-ql", "-s",
+                "--resolution", f"{width},{height}",
+                "--media_dir", media_dir, script_path, "MathScene"
+            ]
+            render_executor.run(f"{job_id}-dry-run", cmd, log_path=log_path, timeout=DRY_RUN_TIMEOUT)
+    except RenderError as e:
+        return [f"Dry run failed: {e.args[0]}\n{e.log_tail[-1500:]}"]
+    return []
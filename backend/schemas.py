@@ -1,6 +1,6 @@
 # backend/schemas.py
 from pydantic import BaseModel, ConfigDict
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Dict
 from enum import Enum
 from datetime import datetime
 
@@ -43,6 +43,13 @@ class Classroom(ClassroomBase):
     students: List[User] = []
     model_config = ConfigDict(from_attributes=True)
 
+# Same without the student roster (the /summary listings)
+class ClassroomSummary(ClassroomBase):
+    id: int
+    teacher_id: int
+    student_count: int = 0
+    model_config = ConfigDict(from_attributes=True)
+
 # Document Schemas
 class DocumentResponse(BaseModel):
     id: int
@@ -67,23 +74,55 @@ class GeneratedLessonResponse(BaseModel):
     content: str
     student_id: int
     
+    model_config = ConfigDict(from_attributes=True)
+class BaselineLessonResponse(BaseModel):
+    id: int
+    topic: str
+    grade_level: str
+    content: str
+    created_at: datetime
+
     model_config = ConfigDict(from_attributes=True)
 class PersonalizeRequest(BaseModel):
     student_interest: str
     student_grade: str
     student_name: str
 
+class BatchPersonalizeRequest(BaseModel):
+    student_grade: str
+    default_interest: str = "everyday life"
+    student_interests: Dict[int, str] = {}  # student_id -> interest
+
+class BatchPersonalizeResponse(BaseModel):
+    job_id: str
+    classroom_id: int
+    document_id: int
+    student_count: int
+    status: str
+    lessons_created: Optional[int] = None
+    failed_student_ids: List[int] = []
+
 class VideoStatusResponse(BaseModel):
     job_id: str
     status: str
     video_url: Optional[str] = None
     message: Optional[str] = None
+    error: Optional[str] = None
+    hq_status: Optional[str] = None
+    hq_video_url: Optional[str] = None
+    playlist_url: Optional[str] = None
 class GeneratedVideoResponse(BaseModel):
     id: int
     job_id: str
     topic: str
     status: str
     created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    error: Optional[str] = None
     video_url: Optional[str] = None # The temporary link we will generate
+    hq_status: Optional[str] = None
+    hq_video_url: Optional[str] = None # High-quality render, once available
+    playlist_url: Optional[str] = None # HLS stream, playable while the preview renders
 
     model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
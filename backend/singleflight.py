@@ -0,0 +1,126 @@
+# backend/singleflight.py
+# Request coalescing: identical in-flight generations share ONE LLM call.
+#   - In-process: callers with the same key await the same asyncio future.
+#   - Across workers: a Redis lock elects one leader, followers poll for its result.
+#   - If the leader fails or is cancelled, its followers elect a new leader the same way
+#     (one retry for all of them, not one per follower); the error is the leader's own.
+# Not a response cache: the result is only handed to requests that arrived while it
+# was being generated, and expires SINGLEFLIGHT_RESULT_TTL seconds after it is published.
+# Takes the async Redis client, so waiting followers never block the event loop.
+import os
+import asyncio
+import hashlib
+import json
+import uuid
+from redis.exceptions import RedisError
+
+SINGLEFLIGHT_LOCK_TTL = int(os.getenv("SINGLEFLIGHT_LOCK_TTL", 120))     # max seconds a leader may hold the key
+SINGLEFLIGHT_RESULT_TTL = int(os.getenv("SINGLEFLIGHT_RESULT_TTL", 5))   # how long followers can pick up the result
+SINGLEFLIGHT_POLL_INTERVAL = float(os.getenv("SINGLEFLIGHT_POLL_INTERVAL", 0.25))
+
+
+def make_key(payload: dict) -> str:
+    """Stable hash of a request payload."""
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self, redis_conn, namespace: str):
+        self.redis = redis_conn
+        self.namespace = namespace
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def _lock_key(self, key: str) -> str:
+        return f"singleflight:{self.namespace}:{key}:lock"
+
+    def _result_key(self, key: str) -> str:
+        return f"singleflight:{self.namespace}:{key}:result"
+
+    async def do(self, key: str, fn) -> str:
+        """
+        Runs `await fn()` once per key; concurrent callers with the same key
+        receive the same (string) result.
+        """
+        # 1. Someone in this process is already generating it
+        while key in self._inflight:
+            inflight = self._inflight[key]
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise  # we were cancelled, not the leader
+            except Exception:
+                pass
+            # The leader failed or was cancelled: the first follower to get here takes over
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._do_shared(key, fn)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so asyncio doesn't warn when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _do_shared(self, key: str, fn) -> str:
+        lock_key = self._lock_key(key)
+        result_key = self._result_key(key)
+        token = uuid.uuid4().hex
+
+        while True:
+            try:
+                # A result left by an earlier leader is NOT reused: with the lock free, we lead
+                is_leader = await self.redis.set(lock_key, token, nx=True, ex=SINGLEFLIGHT_LOCK_TTL)
+            except RedisError as e:
+                print(f"⚠️ Single-flight Redis unavailable, generating locally: {e}")
+                return await fn()
+            if is_leader:
+                break
+
+            # 2. Another worker is generating it: wait for its result
+            result = await self._wait_for_leader(lock_key, result_key)
+            if result is not None:
+                return result
+            # Leader failed or timed out: race the other followers for the lock
+
+        # 3. We are the leader
+        try:
+            result = await fn()
+            try:
+                await self.redis.set(result_key, result, ex=SINGLEFLIGHT_RESULT_TTL)
+            except RedisError as e:
+                print(f"⚠️ Could not publish single-flight result: {e}")
+            return result
+        finally:
+            try:
+                # Only release the lock if it is still ours
+                if await self.redis.get(lock_key) == token.encode("utf-8"):
+                    await self.redis.delete(lock_key)
+            except RedisError:
+                pass
+
+    async def _wait_for_leader(self, lock_key: str, result_key: str):
+        """Polls until the leader publishes a result (str) or releases the lock (None)."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SINGLEFLIGHT_LOCK_TTL
+        while loop.time() < deadline:
+            await asyncio.sleep(SINGLEFLIGHT_POLL_INTERVAL)
+            try:
+                # One round trip per poll
+                cached, locked = await self.redis.pipeline(transaction=False).get(result_key).exists(lock_key).execute()
+                if cached is not None:
+                    return cached.decode("utf-8")
+                if not locked:
+                    return None
+            except RedisError:
+                return None
+        return None
@@ -0,0 +1,354 @@
+# backend/storage.py
+# Object storage, selected with STORAGE_BACKEND:
+#   "minio" (default): the MinIO client from minio_client.py
+#   "local": plain files under LOCAL_STORAGE_ROOT, for single-node deployments,
+#            tests and benchmarks (no network hop, no MinIO server)
+# Both expose the subset of the MinIO client API we use, so callers only ever
+# talk to `storage_client` and don't care which backend is configured.
+import os
+import time
+import hmac
+import mmap
+import shutil
+import asyncio
+import hashlib
+import tempfile
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Protocol
+from urllib.parse import quote, urlencode
+from minio.error import S3Error
+from minio_client import minio_client, BUCKET_NAME, STORAGE_MAX_WORKERS
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "minio")
+LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", "./object_storage")
+# Presigned local URLs are served by the API itself (GET /storage/...)
+LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL", "http://localhost:8000")
+LOCAL_STORAGE_SECRET = os.getenv("LOCAL_STORAGE_SECRET") or os.getenv("SECRET_KEY") or "local-storage"
+
+
+class ObjectStorage(Protocol):
+    """The part of the MinIO client API the app relies on."""
+    def put_object(self, bucket_name, object_name, data, length=-1, **kwargs): ...
+    def fput_object(self, bucket_name, object_name, file_path, **kwargs): ...
+    def get_object(self, bucket_name, object_name, offset=0, length=0, **kwargs): ...
+    def stat_object(self, bucket_name, object_name, **kwargs): ...
+    def remove_object(self, bucket_name, object_name, **kwargs): ...
+    def list_objects(self, bucket_name, prefix=None, recursive=False, **kwargs): ...
+    def presigned_get_object(self, bucket_name, object_name, expires=timedelta(days=7), **kwargs): ...
+
+
+# ==========================================
+#      LOCAL FILESYSTEM BACKEND
+# ==========================================
+
+class ObjectNotFound(FileNotFoundError):
+    pass
+
+
+# What a missing/unreadable object raises, whichever backend is configured
+STORAGE_ERRORS = (S3Error, ObjectNotFound)
+
+
+@dataclass
+class LocalObjectInfo:
+    """Mirrors the fields of minio.datatypes.Object we use."""
+    object_name: str
+    size: int = 0
+    etag: str | None = None
+    last_modified: datetime | None = None
+    content_type: str | None = None
+    is_dir: bool = False
+
+
+class LocalObject:
+    """A download from the local backend: the file is memory-mapped, not copied."""
+
+    def __init__(self, path: str, offset: int = 0, length: int = 0):
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap can't map an empty file
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._pos = min(offset, size)
+        self._end = min(size, offset + length) if length else size
+
+    def read(self, amt: int | None = None) -> bytes:
+        if self._mmap is None:
+            return b""
+        end = self._end if amt is None else min(self._end, self._pos + amt)
+        chunk = self._mmap[self._pos:end]
+        self._pos = end
+        return chunk
+
+    def stream(self, amt: int = 32 * 1024):
+        while chunk := self.read(amt):
+            yield chunk
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+    def release_conn(self):
+        pass
+
+
+class LocalStorage:
+    def __init__(self, root: str = LOCAL_STORAGE_ROOT, base_url: str = LOCAL_STORAGE_URL,
+                 secret: str = LOCAL_STORAGE_SECRET):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+        self._secret = secret.encode("utf-8")
+        os.makedirs(self.root, exist_ok=True)
+
+    def file_path(self, bucket_name: str, object_name: str) -> str:
+        bucket_dir = os.path.join(self.root, bucket_name)
+        path = os.path.normpath(os.path.join(bucket_dir, object_name))
+        if not path.startswith(bucket_dir + os.sep):
+            raise ValueError(f"Invalid object name: {object_name}")
+        return path
+
+    def _info(self, bucket_name: str, object_name: str, st: os.stat_result) -> LocalObjectInfo:
+        return LocalObjectInfo(
+            object_name=object_name,
+            size=st.st_size,
+            etag=f"{st.st_mtime_ns:x}-{st.st_size:x}",  # cheap and changes with every write
+            last_modified=datetime.fromtimestamp(st.st_mtime, tz=timezone.utc),
+        )
+
+    # --- Buckets ---
+    def bucket_exists(self, bucket_name: str) -> bool:
+        return os.path.isdir(os.path.join(self.root, bucket_name))
+
+    def make_bucket(self, bucket_name: str):
+        os.makedirs(os.path.join(self.root, bucket_name), exist_ok=True)
+
+    # --- Writes (temp file + rename, so readers never see a partial object) ---
+    def _write(self, bucket_name: str, object_name: str, copy):
+        path = self.file_path(bucket_name, object_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                copy(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def put_object(self, bucket_name: str, object_name: str, data, length: int = -1, **kwargs):
+        self._write(bucket_name, object_name, lambda f: shutil.copyfileobj(data, f, 1024 * 1024))
+
+    def fput_object(self, bucket_name: str, object_name: str, file_path: str, **kwargs):
+        def copy(f):
+            with open(file_path, "rb") as src:
+                shutil.copyfileobj(src, f, 1024 * 1024)
+        self._write(bucket_name, object_name, copy)
+
+    # --- Reads ---
+    def get_object(self, bucket_name: str, object_name: str, offset: int = 0, length: int = 0, **kwargs):
+        try:
+            return LocalObject(self.file_path(bucket_name, object_name), offset, length)
+        except FileNotFoundError:
+            raise ObjectNotFound(f"{bucket_name}/{object_name}")
+
+    def stat_object(self, bucket_name: str, object_name: str, **kwargs) -> LocalObjectInfo:
+        try:
+            st = os.stat(self.file_path(bucket_name, object_name))
+        except FileNotFoundError:
+            raise ObjectNotFound(f"{bucket_name}/{object_name}")
+        return self._info(bucket_name, object_name, st)
+
+    def remove_object(self, bucket_name: str, object_name: str, **kwargs):
+        try:
+            os.remove(self.file_path(bucket_name, object_name))
+        except FileNotFoundError:
+            pass  # same as S3: deleting a missing object succeeds
+
+    def list_objects(self, bucket_name: str, prefix: str | None = None, recursive: bool = False, **kwargs):
+        bucket_dir = os.path.join(self.root, bucket_name)
+        prefix = prefix or ""
+        start = os.path.join(bucket_dir, os.path.dirname(prefix))
+        for dirpath, dirnames, filenames in os.walk(start):
+            rel_dir = os.path.relpath(dirpath, bucket_dir).replace(os.sep, "/")
+            rel_dir = "" if rel_dir == "." else rel_dir + "/"
+            if not recursive:
+                for d in sorted(dirnames):
+                    if (rel_dir + d + "/").startswith(prefix):
+                        yield LocalObjectInfo(object_name=rel_dir + d + "/", is_dir=True)
+                dirnames.clear()
+            for name in sorted(filenames):
+                object_name = rel_dir + name
+                if name.startswith(".upload-") or not object_name.startswith(prefix):
+                    continue
+                yield self._info(bucket_name, object_name, os.stat(os.path.join(dirpath, name)))
+
+    # --- Presigned URLs, served by GET /storage/{bucket}/{object} ---
+    def _signature(self, bucket_name: str, object_name: str, params: dict) -> str:
+        message = f"{bucket_name}/{object_name}?{urlencode(sorted(params.items()))}"
+        return hmac.new(self._secret, message.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def presigned_get_object(self, bucket_name: str, object_name: str, expires: timedelta = timedelta(days=7),
+                             response_headers: dict | None = None, request_date: datetime | None = None, **kwargs):
+        signed_at = request_date or datetime.now(timezone.utc)
+        params = {"expires": str(int((signed_at + expires).timestamp()))}
+        for header, param in (("response-content-disposition", "disposition"), ("response-content-type", "type")):
+            if response_headers and response_headers.get(header):
+                params[param] = response_headers[header]
+        params["signature"] = self._signature(bucket_name, object_name, params)
+        return f"{self.base_url}/storage/{bucket_name}/{quote(object_name)}?{urlencode(params)}"
+
+    def verify(self, bucket_name: str, object_name: str, params: dict) -> bool:
+        """Checks the signature and expiry of a presigned local URL's query parameters."""
+        params = dict(params)
+        signature = params.pop("signature", "")
+        if not hmac.compare_digest(signature, self._signature(bucket_name, object_name, params)):
+            return False
+        return int(params.get("expires", 0)) >= time.time()
+
+
+storage_client: ObjectStorage = LocalStorage() if STORAGE_BACKEND == "local" else minio_client
+
+
+storage_executor = ThreadPoolExecutor(max_workers=STORAGE_MAX_WORKERS, thread_name_prefix="storage")
+
+
+# ==========================================
+#      ASYNC STORAGE (for async def routes)
+# ==========================================
+# Both backends are blocking. These helpers run them on storage_executor,
+# so slow storage never stalls the event loop.
+
+async def run_storage(fn, *args, **kwargs):
+    """Runs a blocking storage call on the storage pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(storage_executor, functools.partial(fn, *args, **kwargs))
+
+async def stat_object(bucket_name: str, object_name: str):
+    return await run_storage(storage_client.stat_object, bucket_name, object_name)
+
+async def get_object_bytes(bucket_name: str, object_name: str) -> bytes:
+    def read():
+        response = storage_client.get_object(bucket_name, object_name)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+    return await run_storage(read)
+
+async def open_object(bucket_name: str, object_name: str, offset: int = 0, length: int = 0):
+    """Starts a download; read it with stream_object()."""
+    return await run_storage(storage_client.get_object, bucket_name, object_name, offset=offset, length=length)
+
+async def stream_object(response, chunk_size: int = 32 * 1024):
+    """Yields an open download chunk by chunk, each read on the storage pool."""
+    try:
+        while True:
+            chunk = await run_storage(response.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        response.close()
+        response.release_conn()
+
+async def put_object(bucket_name: str, object_name: str, data, length: int = -1, **kwargs):
+    return await run_storage(storage_client.put_object, bucket_name, object_name, data, length, **kwargs)
+
+
+# ==========================================
+#      PRESIGNED URL CACHE
+# ==========================================
+# Listing endpoints sign a URL per video on every request. A signed URL stays
+# valid until it expires, so we hand out the same one until PRESIGNED_URL_SAFETY_MARGIN
+# before that, instead of paying an HMAC signature per object per request.
+PRESIGNED_URL_EXPIRY = int(os.getenv("PRESIGNED_URL_EXPIRY", 7 * 24 * 3600))          # seconds (MinIO default)
+PRESIGNED_URL_SAFETY_MARGIN = int(os.getenv("PRESIGNED_URL_SAFETY_MARGIN", 3600))      # seconds
+PRESIGNED_URL_CACHE_SIZE = int(os.getenv("PRESIGNED_URL_CACHE_SIZE", 10000))
+
+
+class PresignedUrlCache:
+    def __init__(self, storage, bucket_name: str, expiry: int = PRESIGNED_URL_EXPIRY,
+                 safety_margin: int = PRESIGNED_URL_SAFETY_MARGIN, max_size: int = PRESIGNED_URL_CACHE_SIZE):
+        self.storage = storage
+        self.bucket_name = bucket_name
+        self.expiry = expiry
+        self.safety_margin = min(safety_margin, expiry // 2)
+        self.max_size = max_size
+        self._urls: OrderedDict[str, tuple[str, float]] = OrderedDict()  # object -> (url, reuse until)
+        self._lock = threading.Lock()
+
+    def _sign(self, object_name: str, request_date: datetime, response_headers: dict | None = None) -> str:
+        return self.storage.presigned_get_object(
+            self.bucket_name, object_name,
+            expires=timedelta(seconds=self.expiry),
+            response_headers=response_headers,
+            request_date=request_date,
+        )
+
+    def get(self, object_name: str, response_headers: dict | None = None) -> str:
+        """`response_headers` (e.g. response-content-disposition) must depend only on the object."""
+        return self.get_many([object_name], response_headers)[object_name]
+
+    def get_many(self, object_names, response_headers: dict | None = None) -> dict:
+        """Returns {object_name: url}, signing only the names without a fresh cached URL."""
+        now = time.time()
+        urls, missing = {}, []
+        with self._lock:
+            for name in dict.fromkeys(object_names):
+                cached = self._urls.get(name)
+                if cached and cached[1] > now:
+                    self._urls.move_to_end(name)
+                    urls[name] = cached[0]
+                else:
+                    missing.append(name)
+
+        if missing:
+            # One signing timestamp for the whole batch
+            request_date = datetime.now(timezone.utc)
+            reuse_until = now + self.expiry - self.safety_margin
+            signed = {name: self._sign(name, request_date, response_headers) for name in missing}
+            urls.update(signed)
+
+            with self._lock:
+                for name, url in signed.items():
+                    self._urls[name] = (url, reuse_until)
+                    self._urls.move_to_end(name)
+                while len(self._urls) > self.max_size:
+                    self._urls.popitem(last=False)
+        return urls
+
+    async def aget(self, object_name: str, response_headers: dict | None = None) -> str:
+        return (await self.aget_many([object_name], response_headers))[object_name]
+
+    async def aget_many(self, object_names, response_headers: dict | None = None) -> dict:
+        """Like get_many, but signing runs on the storage pool."""
+        object_names = list(object_names)
+        now = time.time()
+        with self._lock:
+            cached = {name: self._urls.get(name) for name in object_names}
+            if all(entry and entry[1] > now for entry in cached.values()):
+                # Everything cached: no thread hop needed
+                for name in cached:
+                    self._urls.move_to_end(name)
+                return {name: entry[0] for name, entry in cached.items()}
+        return await run_storage(self.get_many, object_names, response_headers)
+
+    def invalidate(self, object_name: str):
+        with self._lock:
+            self._urls.pop(object_name, None)
+
+
+url_cache = PresignedUrlCache(storage_client, BUCKET_NAME)
+
+# Document downloads get short-lived URLs. Reusing the same URL for a while
+# lets the browser revalidate against storage (ETag -> 304) instead of re-downloading.
+DOWNLOAD_URL_EXPIRY = int(os.getenv("DOWNLOAD_URL_EXPIRY", 900))  # seconds
+download_url_cache = PresignedUrlCache(
+    storage_client, BUCKET_NAME, expiry=DOWNLOAD_URL_EXPIRY, safety_margin=DOWNLOAD_URL_EXPIRY // 3
+)
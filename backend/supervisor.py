@@ -0,0 +1,201 @@
+# backend/supervisor.py
+# Runs a pool of RQ worker processes and sizes it from queue depth.
+#   python supervisor.py
+#
+# - Every worker drains the queues in priority order (interactive > batch > ingestion),
+#   so a student waiting on a preview never sits behind an HQ re-render.
+# - The first RESERVED_INTERACTIVE_WORKERS only listen on "interactive", so even a
+#   pool full of long ingestion jobs leaves room for previews.
+# - The pool grows when jobs are waiting and shrinks back to MIN_WORKERS when idle.
+#   Queues are shared by every node, so each supervisor takes its share of the demand:
+#   supervisors heartbeat into a Redis sorted set, and the live ones split the work.
+#   Idle workers are stopped oldest first with SIGTERM (RQ warm shutdown).
+# - Every GC_INTERVAL it removes leftover temp files (and, with GC_VECTOR_STORE=1, orphaned
+#   vectors) of this node and enqueues the shared garbage collection pass on gc_queue
+#   (see reconciler.py).
+import os
+import sys
+import math
+import time
+import signal
+import socket
+import multiprocessing
+from rq import Queue, Worker
+from rq.registry import StartedJobRegistry
+from dotenv import load_dotenv
+from redis_client import redis_conn
+
+load_dotenv()
+
+# Renders are CPU-bound; by default allow as many workers as concurrent renders
+RENDERS_PER_CORE = float(os.getenv("RENDERS_PER_CORE", 0.5))
+MIN_WORKERS = int(os.getenv("MIN_WORKERS", 1))
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", max(1, int((os.cpu_count() or 1) * RENDERS_PER_CORE))))
+RESERVED_INTERACTIVE_WORKERS = int(os.getenv("RESERVED_INTERACTIVE_WORKERS", 1))
+JOBS_PER_WORKER = int(os.getenv("JOBS_PER_WORKER", 2))          # queued jobs we tolerate per extra worker
+SCALE_INTERVAL = float(os.getenv("SCALE_INTERVAL", 5))          # seconds between checks
+SCALE_DOWN_AFTER = int(os.getenv("SCALE_DOWN_AFTER", 6))        # consecutive idle checks before shrinking
+SUPERVISOR_HEARTBEAT_TTL = int(os.getenv("SUPERVISOR_HEARTBEAT_TTL", 60))  # seconds of silence before a node stops counting
+SUPERVISORS_KEY = "supervisors"                                  # sorted set: supervisor id -> last heartbeat
+
+
+def run_worker(queue_names: list[str], name: str):
+    """Entry point of one worker process."""
+    # Own process group: Ctrl+C reaches only the supervisor, which then stops us gracefully
+    os.setpgrp()
+    # Imported here so every process opens its own Redis/MinIO/DB connections
+    from rq import SimpleWorker
+    import worker as tasks
+
+    if tasks.RENDER_MODE == "warm":
+        tasks.warm_render_pool.start()  # pay the Manim import before the first job, not during it
+    print(f"👷 {name} listening on {', '.join(queue_names)}")
+    rq_worker = SimpleWorker(queue_names, connection=tasks.redis_conn, name=name)
+    # Only one worker at a time wins the scheduler lock, the others skip it
+    rq_worker.work(with_scheduler=True)
+
+
+class Supervisor:
+    def __init__(self, queue_names: list[str], interactive_queue: str,
+                 min_workers: int = MIN_WORKERS, max_workers: int = MAX_WORKERS,
+                 reserved: int = RESERVED_INTERACTIVE_WORKERS, gc_queue: str | None = None):
+        self.queue_names = queue_names
+        self.interactive_queue = interactive_queue
+        self.max_workers = max(1, max_workers)
+        self.min_workers = max(0, min(min_workers, self.max_workers))
+        self.reserved = max(0, min(reserved, self.min_workers))
+        self.redis = redis_conn
+        self.queues = [Queue(q, connection=self.redis) for q in queue_names]
+        self.ctx = multiprocessing.get_context("spawn")
+        self.reserved_workers: list[multiprocessing.Process] = []
+        self.workers: list[multiprocessing.Process] = []
+        self.stopping: list[multiprocessing.Process] = []
+        self.idle_checks = 0
+        self.gc_queue = gc_queue
+        self.last_gc = 0.0
+        self.running = True
+        self._counter = 0
+        self.id = f"{socket.gethostname()}:{os.getpid()}"
+
+    # --- Queue state ---
+    def queued_jobs(self) -> int:
+        return sum(q.count for q in self.queues)
+
+    def started_jobs(self) -> int:
+        return sum(StartedJobRegistry(queue=q).count for q in self.queues)
+
+    def live_supervisors(self) -> int:
+        """Heartbeats for this supervisor and counts the live ones (this one included)."""
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.zadd(SUPERVISORS_KEY, {self.id: now})
+        pipe.zremrangebyscore(SUPERVISORS_KEY, "-inf", now - SUPERVISOR_HEARTBEAT_TTL)
+        pipe.zcard(SUPERVISORS_KEY)
+        return max(1, pipe.execute()[-1])
+
+    def desired_workers(self) -> int:
+        # Keep every busy worker, plus one more per JOBS_PER_WORKER waiting jobs,
+        # split across the nodes that serve the same queues
+        demand = self.started_jobs() + math.ceil(self.queued_jobs() / JOBS_PER_WORKER)
+        wanted = math.ceil(demand / self.live_supervisors())
+        return max(self.min_workers, min(self.max_workers, wanted))
+
+    # --- Process management ---
+    def spawn(self, reserved: bool = False):
+        self._counter += 1
+        queue_names = [self.interactive_queue] if reserved else self.queue_names
+        name = f"{'interactive' if reserved else 'worker'}-{os.getpid()}-{self._counter}"
+        proc = self.ctx.Process(target=run_worker, args=(queue_names, name), name=name)
+        proc.start()
+        (self.reserved_workers if reserved else self.workers).append(proc)
+
+    def is_idle(self, proc: multiprocessing.Process) -> bool:
+        rq_worker = Worker.find_by_key(Worker.redis_worker_namespace_prefix + proc.name, connection=self.redis)
+        # Not registered yet: still starting up, no job to lose
+        return rq_worker is None or rq_worker.get_current_job_id() is None
+
+    def retire(self, count: int):
+        # Idle workers only, oldest first (they carry the most leaked memory);
+        # reserved interactive workers are never retired
+        for proc in [p for p in self.workers if self.is_idle(p)][:count]:
+            print(f"📉 Stopping {proc.name}")
+            os.kill(proc.pid, signal.SIGTERM)
+            self.workers.remove(proc)
+            self.stopping.append(proc)
+
+    def reap(self):
+        for pool in (self.reserved_workers, self.workers):
+            for proc in [p for p in pool if not p.is_alive()]:
+                print(f"⚠️ {proc.name} exited with code {proc.exitcode}")
+                pool.remove(proc)
+        self.stopping = [p for p in self.stopping if p.is_alive()]
+
+    def scale(self):
+        self.reap()
+        # Reserved workers are replaced as soon as they die
+        for _ in range(self.reserved - len(self.reserved_workers)):
+            self.spawn(reserved=True)
+
+        desired = self.desired_workers() - self.reserved
+        current = len(self.workers)
+
+        if desired > current:
+            self.idle_checks = 0
+            print(f"📈 Scaling {current} -> {desired} workers ({self.queued_jobs()} jobs queued)")
+            for _ in range(desired - current):
+                self.spawn()
+        elif desired < current:
+            # Don't thrash on a momentary lull
+            self.idle_checks += 1
+            if self.idle_checks >= SCALE_DOWN_AFTER:
+                self.idle_checks = 0
+                self.retire(current - desired)
+        else:
+            self.idle_checks = 0
+
+    def collect_garbage(self):
+        # Imported here, like the workers: the supervisor itself stays light
+        import reconciler
+
+        if time.monotonic() - self.last_gc < reconciler.GC_INTERVAL:
+            return
+        self.last_gc = time.monotonic()
+        try:
+            # Workers run in our working directory, so their temp_* leftovers are here
+            # (plus the vectors, if this node owns the store: GC_VECTOR_STORE=1)
+            reconciler.sweep_node(os.getcwd())
+            if self.gc_queue and reconciler.enqueue_if_due(self.redis, self.gc_queue):
+                print(f"♻️ Enqueued garbage collection on '{self.gc_queue}'")
+        except Exception as e:
+            print(f"⚠️ Garbage collection failed: {e}")
+
+    def shutdown(self, *_):
+        self.running = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.shutdown)
+        signal.signal(signal.SIGINT, self.shutdown)
+        print(f"🧭 Supervisor started ({self.min_workers}-{self.max_workers} workers, "
+              f"{self.reserved} reserved for '{self.interactive_queue}')")
+
+        while self.running:
+            self.scale()
+            self.collect_garbage()
+            time.sleep(SCALE_INTERVAL)
+
+        # Warm shutdown: let every worker finish its current job
+        print("🛑 Stopping all workers...")
+        self.redis.zrem(SUPERVISORS_KEY, self.id)
+        everyone = self.reserved_workers + self.workers + self.stopping
+        for proc in everyone:
+            if proc.is_alive():
+                os.kill(proc.pid, signal.SIGTERM)
+        for proc in everyone:
+            proc.join()
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from worker import WORKER_QUEUES, QUEUE_INTERACTIVE, QUEUE_BATCH
+
+    Supervisor(WORKER_QUEUES, QUEUE_INTERACTIVE, gc_queue=QUEUE_BATCH).run()
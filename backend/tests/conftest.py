@@ -0,0 +1,14 @@
+# backend/tests/conftest.py
+# Unit tests of the backend helpers:
+#   cd backend && python -m pytest
+# Nothing external is needed: Redis is fakeredis, storage a temp directory,
+# and the database a throwaway SQLite file.
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set before any backend module reads them (load_dotenv never overrides these)
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ.setdefault("GEMINI_API_KEY", "test")
@@ -0,0 +1,30 @@
+from langchain_core.documents import Document as LCDocument
+
+from artifacts import (
+    chunk_records, chunks_path, page_records, pages_from_records, pages_path,
+    read_jsonl_gz, save_artifacts, split_pages,
+)
+from storage import LocalStorage
+
+
+def test_paths_share_the_document_prefix():
+    assert pages_path(3, 7) == "classroom_3/documents/document_7/pages.jsonl.gz"
+    assert chunks_path(3, 7) == "classroom_3/documents/document_7/chunks.jsonl.gz"
+
+
+def test_records_round_trip_through_storage(tmp_path):
+    storage = LocalStorage(root=str(tmp_path))
+    pages = [LCDocument(page_content="Première page. " * 100, metadata={"page": 0, "source": "/tmp/x"}),
+             LCDocument(page_content="Second page.", metadata={"page": 1})]
+    chunks = chunk_records(split_pages(pages, chunk_size=200, chunk_overlap=20), 7, 3, "notes.pdf")
+    save_artifacts(storage, "bucket", 3, 7, page_records(pages), chunks)
+
+    stored_pages = read_jsonl_gz(storage, "bucket", pages_path(3, 7))
+    assert stored_pages == [{"page": 0, "text": pages[0].page_content}, {"page": 1, "text": "Second page."}]
+    assert [p.page_content for p in pages_from_records(stored_pages)] == [p.page_content for p in pages]
+
+    stored_chunks = read_jsonl_gz(storage, "bucket", chunks_path(3, 7))
+    assert stored_chunks == chunks
+    assert [c["id"] for c in chunks] == [f"doc7-chunk{i}" for i in range(len(chunks))]
+    assert chunks[-1]["page"] == 1
+    assert chunks[0]["metadata"] == {"document_id": 7, "classroom_id": 3, "filename": "notes.pdf"}
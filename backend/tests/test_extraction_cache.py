@@ -0,0 +1,14 @@
+import fakeredis
+
+from extraction_cache import ExtractionCache
+
+
+def test_extraction_cache():
+    redis = fakeredis.FakeRedis()
+    cache = ExtractionCache(redis, ttl=100)
+    assert cache.get("notes") == {}
+    cache.put("notes", latex="L", code="C")
+    assert cache.get("notes") == {"latex": "L", "code": "C"}
+    cache.drop("notes", "code")
+    assert cache.get("notes") == {"latex": "L"}
+    assert 0 < redis.ttl(cache._key("notes")) <= 100
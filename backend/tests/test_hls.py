@@ -0,0 +1,21 @@
+from hls import playlist_path, render_playlist, segment_prefix
+
+
+def test_event_playlist_while_rendering():
+    body = render_playlist([("segment_00000.ts", 2.5), ("segment_00001.ts", 12.2)], ended=False)
+    lines = body.splitlines()
+    assert lines[0] == "#EXTM3U"
+    assert "#EXT-X-PLAYLIST-TYPE:EVENT" in lines
+    assert "#EXT-X-TARGETDURATION:13" in lines  # longest segment, rounded up
+    assert lines[-2:] == ["#EXTINF:12.200,", "segment_00001.ts"]
+    assert "#EXT-X-ENDLIST" not in lines
+
+
+def test_finished_playlist_ends():
+    body = render_playlist([("segment_00000.ts", 1.0)], ended=True)
+    assert body.endswith("#EXT-X-ENDLIST\n")
+    assert "#EXT-X-TARGETDURATION:10" in body  # never below HLS_TARGET_DURATION
+
+
+def test_paths():
+    assert playlist_path("job").startswith(segment_prefix("job"))
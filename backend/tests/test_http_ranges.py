@@ -0,0 +1,55 @@
+import pytest
+from fastapi import HTTPException
+
+from http_ranges import etag_matches, parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),          # open-ended
+    ("bytes=-100", (900, 999)),          # suffix: the last 100 bytes
+    ("bytes=-5000", (0, 999)),           # suffix longer than the file
+    ("bytes=500-5000", (500, 999)),      # end past the file is clamped
+    ("bytes=999-999", (999, 999)),
+])
+def test_satisfiable_ranges(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [
+    None,
+    "",
+    "items=0-10",            # not bytes
+    "bytes=0-10,20-30",      # multiple ranges: full response
+    "bytes=abc-",
+    "bytes=-",
+])
+def test_full_response(header):
+    assert parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1000-", 1000),    # starts past the end
+    ("bytes=1000-1200", 1000),
+    ("bytes=50-10", 1000),    # end before start
+    ("bytes=0-", 0),          # empty file
+    ("bytes=-0", 1000),       # zero-length suffix
+])
+def test_unsatisfiable_ranges(header, size):
+    with pytest.raises(HTTPException) as exc:
+        parse_range(header, size)
+    assert exc.value.status_code == 416
+    assert exc.value.headers["Content-Range"] == f"bytes */{size}"
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ('"abc"', True),
+    ('"xyz", "abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+    ('W/"abc"', False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
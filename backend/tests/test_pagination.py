@@ -0,0 +1,96 @@
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import Column, Integer, create_engine, select
+from sqlalchemy.orm import Session, declarative_base
+from starlette.responses import Response
+
+from pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, PageParams, next_page, paginate
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+    id = Column(Integer, primary_key=True)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(Item(id=i) for i in range(1, 8))
+        session.commit()
+        yield session
+
+
+def page(limit, cursor=None):
+    params = PageParams.__new__(PageParams)
+    params.limit, params.cursor = limit, cursor
+    return params
+
+
+def fetch(db, params, descending=False):
+    """One request: rows of the page and the cursor header sent with them."""
+    response = Response()
+    rows = db.execute(paginate(select(Item), Item.id, params, descending)).scalars().all()
+    rows = next_page(response, rows, params)
+    return [r.id for r in rows], response.headers.get(NEXT_CURSOR_HEADER)
+
+
+def walk(db, limit, descending=False):
+    ids, cursor = [], None
+    while True:
+        # The header value is what the client sends back as ?cursor=
+        batch, header = fetch(db, page(limit, int(cursor) if cursor else None), descending)
+        ids += batch
+        if header is None:
+            return ids
+        cursor = header
+
+
+def test_first_page_sets_cursor_to_last_row(db):
+    assert fetch(db, page(3)) == ([1, 2, 3], "3")
+
+
+def test_last_page_has_no_cursor(db):
+    assert fetch(db, page(3, cursor=6)) == ([7], None)
+
+
+def test_exact_fit_has_no_cursor(db):
+    assert fetch(db, page(7)) == (list(range(1, 8)), None)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 50])
+def test_walk_returns_every_row_once(db, limit):
+    assert walk(db, limit) == list(range(1, 8))
+    assert walk(db, limit, descending=True) == list(range(7, 0, -1))
+
+
+def test_inserts_do_not_shift_later_pages(db):
+    first, cursor = fetch(db, page(3, None), descending=True)
+    db.add(Item(id=100))  # newer than everything already sent
+    db.commit()
+    rest, _ = fetch(db, page(10, int(cursor)), descending=True)
+    assert first + rest == list(range(7, 0, -1))
+
+
+def test_without_page_only_orders(db):
+    rows = db.execute(paginate(select(Item), Item.id)).scalars().all()
+    assert [r.id for r in rows] == list(range(1, 8))
+
+
+def test_page_params_limits():
+    app = FastAPI()
+
+    @app.get("/items")
+    def items(params: PageParams = Depends()):
+        return {"limit": params.limit, "cursor": params.cursor}
+
+    client = TestClient(app)
+    assert client.get("/items").json() == {"limit": 50, "cursor": None}
+    assert client.get("/items", params={"limit": 5, "cursor": 9}).json() == {"limit": 5, "cursor": 9}
+    assert client.get("/items", params={"limit": MAX_PAGE_SIZE + 1}).status_code == 422
+    assert client.get("/items", params={"limit": 0}).status_code == 422
+    assert client.get("/items", params={"cursor": "abc"}).status_code == 422
@@ -0,0 +1,118 @@
+import io
+import os
+
+import fakeredis
+import pytest
+
+import models
+import reconciler
+from database import SessionLocal, engine
+from storage import LocalStorage
+
+BUCKET = "bucket"
+
+
+@pytest.fixture
+def world(tmp_path, monkeypatch):
+    """
+    A teacher's classroom with one live document, one upload that never finished,
+    and storage/Redis/temp leftovers of deleted documents and failed renders.
+    """
+    models.Base.metadata.create_all(engine)
+    storage = LocalStorage(root=str(tmp_path / "objects"))
+    monkeypatch.setattr(reconciler, "storage_client", storage)
+    monkeypatch.setattr(reconciler, "BUCKET_NAME", BUCKET)
+    monkeypatch.setattr(reconciler, "GC_GRACE_PERIOD", -60)  # everything counts as old
+
+    db = SessionLocal()
+    teacher = models.User(username=f"t{os.urandom(4).hex()}", hashed_password="x", role="teacher")
+    db.add(teacher)
+    db.commit()
+    classroom = models.Classroom(name="c", teacher_id=teacher.id)
+    db.add(classroom)
+    db.commit()
+    live = models.Document(filename="a.pdf", bucket_name=BUCKET, storage_path="x",
+                           classroom_id=classroom.id, uploaded_by=teacher.id)
+    stale = models.Document(filename="b.pdf", bucket_name=BUCKET, storage_path="",
+                            classroom_id=classroom.id, uploaded_by=teacher.id)
+    db.add_all([live, stale])
+    db.commit()
+    job = f"job{os.urandom(4).hex()}"
+    db.add(models.GeneratedVideo(job_id=job, minio_path=f"generated_videos/{job}.mp4", user_id=teacher.id))
+    db.commit()
+
+    def put(name, size=10):
+        storage.put_object(BUCKET, name, io.BytesIO(b"x" * size), size)
+
+    put(f"classroom_{classroom.id}/documents/document_{live.id}/original_a.pdf")
+    put(f"classroom_{classroom.id}/documents/document_999999/original_gone.pdf", 100)  # deleted document
+    put(f"generated_videos/{job}.mp4")
+    put("generated_videos/failed.mp4", 1000)                                            # no row
+    put("generated_videos/cached.mp4")
+
+    redis = fakeredis.FakeRedis()
+    redis.set("render_cache:code:abc", "generated_videos/cached.mp4")
+
+    temp_dir = tmp_path / "work"
+    (temp_dir / "temp_job" / "media").mkdir(parents=True)
+    (temp_dir / "temp_job" / "media" / "a.mp4").write_bytes(b"y" * 5)
+    (temp_dir / "keep.txt").write_bytes(b"")
+
+    yield {"db": db, "storage": storage, "redis": redis, "temp_dir": str(temp_dir), "stale_id": stale.id}
+    db.close()
+
+
+def objects(storage):
+    return sorted(o.object_name for o in storage.list_objects(BUCKET, recursive=True))
+
+
+def test_dry_run_reports_without_removing(world):
+    before = objects(world["storage"])
+    report = reconciler.reconcile(world["redis"], dry_run=True, temp_dir=world["temp_dir"], vectors=False)
+
+    assert report == {
+        "stale_uploads": 1, "document_objects": 1, "video_objects": 1,
+        "vectors": 0, "temp_paths": 1, "bytes_reclaimed": 100 + 1000 + 5,
+    }
+    assert objects(world["storage"]) == before
+    assert world["db"].get(models.Document, world["stale_id"]) is not None
+    assert sorted(os.listdir(world["temp_dir"])) == ["keep.txt", "temp_job"]
+
+
+def test_pass_removes_orphans_and_keeps_referenced(world):
+    reconciler.reconcile(world["redis"], temp_dir=world["temp_dir"], vectors=False)
+
+    remaining = objects(world["storage"])
+    assert not any("document_999999" in name or "failed.mp4" in name for name in remaining)
+    assert "generated_videos/cached.mp4" in remaining  # still in the render cache
+    assert len(remaining) == 3
+    world["db"].expire_all()
+    assert world["db"].get(models.Document, world["stale_id"]) is None
+    assert os.listdir(world["temp_dir"]) == ["keep.txt"]
+
+    # Nothing left for a second pass
+    report = reconciler.reconcile(world["redis"], temp_dir=world["temp_dir"], vectors=False)
+    assert report["bytes_reclaimed"] == 0
+
+
+def test_grace_period_protects_new_files(world, monkeypatch):
+    monkeypatch.setattr(reconciler, "GC_GRACE_PERIOD", 3600)
+    report = reconciler.reconcile(world["redis"], dry_run=True, temp_dir=world["temp_dir"], vectors=False)
+    assert report["bytes_reclaimed"] == 0 and report["stale_uploads"] == 0
+
+
+def test_legacy_cache_entries_get_a_ttl(world):
+    reconciler.reconcile(world["redis"], dry_run=True, temp_dir=world["temp_dir"], vectors=False)
+    assert world["redis"].ttl("render_cache:code:abc") == -1  # a dry run changes nothing
+
+    reconciler.reconcile(world["redis"], temp_dir=world["temp_dir"], vectors=False)
+    assert world["redis"].ttl("render_cache:code:abc") > 0
+    assert world["redis"].get("render_cache:code:abc") == b"generated_videos/cached.mp4"
+
+
+def test_vector_sweep_skips_missing_store(world, monkeypatch, tmp_path):
+    missing = tmp_path / "no_chroma"
+    monkeypatch.setattr(reconciler, "CHROMA_DIR", str(missing))
+    report = reconciler.sweep_node(world["temp_dir"], dry_run=True, vectors=True)
+    assert report["vectors"] == 0
+    assert not missing.exists()
@@ -0,0 +1,58 @@
+import fakeredis
+import pytest
+
+from render_cache import RenderCache, content_hash
+from storage import ObjectNotFound
+
+
+class FakeStorage:
+    def __init__(self, objects=()):
+        self.objects = set(objects)
+
+    def stat_object(self, bucket_name, object_name):
+        if object_name not in self.objects:
+            raise ObjectNotFound(object_name)
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeRedis()
+
+
+def test_content_hash_ignores_outer_whitespace():
+    assert content_hash("  x = 1\n") == content_hash("x = 1")
+    assert content_hash("x = 1") != content_hash("x = 2")
+
+
+def test_render_cache_hit(redis):
+    cache = RenderCache(redis, FakeStorage({"v.mp4"}), "bucket")
+    cache.store("v.mp4", code="code", latex="latex")
+    assert cache.lookup("code", "code") == "v.mp4"
+    assert cache.lookup("latex", "latex") == "v.mp4"
+    assert cache.lookup("code", "other") is None
+
+
+def test_render_cache_is_keyed_per_quality(redis):
+    cache = RenderCache(redis, FakeStorage({"v.mp4", "hq.mp4"}), "bucket")
+    cache.store("v.mp4", code="code", latex="latex")
+    cache.store("hq.mp4", code="code", quality="high_quality")
+    assert cache.lookup("code", "code") == "v.mp4"
+    assert cache.lookup("code", "code", "high_quality") == "hq.mp4"
+    assert cache.lookup("latex", "latex", "high_quality") is None
+
+
+def test_render_cache_expires_and_hits_refresh(redis):
+    cache = RenderCache(redis, FakeStorage({"v.mp4"}), "bucket", ttl=100)
+    cache.store("v.mp4", code="code")
+    key = cache._key("code", "code")
+    assert 0 < redis.ttl(key) <= 100
+    redis.expire(key, 5)
+    cache.lookup("code", "code")
+    assert redis.ttl(key) > 5
+
+
+def test_render_cache_drops_entries_of_missing_objects(redis):
+    cache = RenderCache(redis, FakeStorage(), "bucket")
+    cache.store("gone.mp4", code="code")
+    assert cache.lookup("code", "code") is None
+    assert not redis.exists(cache._key("code", "code"))
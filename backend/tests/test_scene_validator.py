@@ -0,0 +1,51 @@
+import pytest
+
+from scene_validator import validate_scene_code
+
+VALID = '''
+from manim import *
+
+class MathScene(Scene):
+    def construct(self):
+        equation = MathTex(r"E = mc^2")
+        title = Tex("Energy")
+        self.play(Write(equation), FadeIn(title))
+'''
+
+
+def test_accepts_valid_scene():
+    assert validate_scene_code(VALID) == []
+
+
+def test_syntax_error():
+    errors = validate_scene_code("class MathScene(Scene)\n    pass")
+    assert len(errors) == 1 and errors[0].startswith("SyntaxError on line 1")
+
+
+@pytest.mark.parametrize("code, message", [
+    ("x = 1", "exactly one top-level class MathScene"),
+    ("class MathScene(Scene):\n    def construct(self): pass\nclass MathScene(Scene):\n    def construct(self): pass",
+     "exactly one top-level class MathScene"),
+    ("class MathScene(VGroup):\n    def construct(self): pass", "must inherit from Scene"),
+    ("class MathScene(Scene):\n    def setup(self): pass", "must define construct(self)"),
+])
+def test_rejects_broken_contract(code, message):
+    assert any(message in e for e in validate_scene_code(code))
+
+
+@pytest.mark.parametrize("body, message", [
+    ('eq = MathTex("a", "b", substrings_to_isolate=["a"])', "substrings_to_isolate"),
+    ('t = Tex("$x^2$")', "NEVER use Tex for math"),
+    ('eq = MathTex("a + b")\n        self.play(Write(eq[0]))', "numeric indices"),
+    ('self.play(Write(MathTex("a + b")[0:2]))', "numeric indices"),
+])
+def test_rejects_banned_constructs(body, message):
+    code = f"class MathScene(Scene):\n    def construct(self):\n        {body}\n"
+    errors = validate_scene_code(code)
+    assert any(message in e for e in errors)
+    assert all(e.startswith("Line ") for e in errors)
+
+
+def test_attribute_base_and_plain_tex_pass():
+    code = 'import manim\nclass MathScene(manim.Scene):\n    def construct(self):\n        t = Tex("Plain words")\n'
+    assert validate_scene_code(code) == []
@@ -0,0 +1,93 @@
+import asyncio
+
+import fakeredis
+
+from singleflight import SingleFlight, make_key
+
+
+def test_make_key_is_order_independent():
+    assert make_key({"a": 1, "b": 2}) == make_key({"b": 2, "a": 1})
+    assert make_key({"a": 1}) != make_key({"a": 2})
+
+
+def test_singleflight_coalesces_across_processes():
+    server = fakeredis.FakeServer()
+    # Two "processes": separate SingleFlight instances on the same Redis
+    first = SingleFlight(fakeredis.aioredis.FakeRedis(server=server), "test")
+    second = SingleFlight(fakeredis.aioredis.FakeRedis(server=server), "test")
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.3)
+        return "lesson"
+
+    async def main():
+        results = await asyncio.gather(first.do("k", generate), first.do("k", generate), second.do("k", generate))
+        # Finished generations are not served as a cache
+        later = await second.do("k", generate)
+        return results, later
+
+    results, later = asyncio.run(main())
+    assert results == ["lesson"] * 3 and later == "lesson"
+    assert len(calls) == 2
+
+
+def flaky_generator(failures=1, delay=0.3):
+    """fn for SingleFlight.do that fails its first `failures` calls."""
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if len(calls) <= failures:
+            raise RuntimeError("LLM down")
+        return "lesson"
+
+    return generate, calls
+
+
+def test_singleflight_followers_retry_after_leader_failure():
+    flight = SingleFlight(fakeredis.aioredis.FakeRedis(), "test")
+    generate, calls = flaky_generator()
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", generate) for _ in range(3)), return_exceptions=True)
+
+    leader, *followers = asyncio.run(main())
+    assert isinstance(leader, RuntimeError)
+    assert followers == ["lesson", "lesson"]
+    assert len(calls) == 2  # one new leader, not one retry per follower
+
+
+def test_singleflight_followers_retry_after_leader_is_cancelled():
+    flight = SingleFlight(fakeredis.aioredis.FakeRedis(), "test")
+    generate, calls = flaky_generator(failures=0)
+
+    async def main():
+        leader = asyncio.create_task(flight.do("k", generate))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(flight.do("k", generate))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == "lesson"
+    assert len(calls) == 2
+
+
+def test_singleflight_one_new_leader_across_processes():
+    server = fakeredis.FakeServer()
+    flights = [SingleFlight(fakeredis.aioredis.FakeRedis(server=server), "test") for _ in range(3)]
+    generate, calls = flaky_generator()
+
+    async def main():
+        leader = asyncio.create_task(flights[0].do("k", generate))
+        await asyncio.sleep(0.05)
+        followers = [flight.do("k", generate) for flight in flights[1:] for _ in range(2)]
+        return await asyncio.gather(leader, *followers, return_exceptions=True)
+
+    leader, *followers = asyncio.run(main())
+    assert isinstance(leader, RuntimeError)
+    assert followers == ["lesson"] * 4
+    assert len(calls) == 2
@@ -0,0 +1,112 @@
+import io
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qsl, urlparse, unquote
+
+import pytest
+
+from storage import LocalStorage, ObjectNotFound, PresignedUrlCache
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorage(root=str(tmp_path), base_url="http://api.test/", secret="secret")
+
+
+def signed_params(url):
+    parsed = urlparse(url)
+    _, _, bucket, object_name = parsed.path.split("/", 3)
+    return bucket, unquote(object_name), dict(parse_qsl(parsed.query))
+
+
+def test_put_get_stat_list_remove(storage):
+    storage.put_object("bucket", "a/b.txt", io.BytesIO(b"hello world"), 11)
+    response = storage.get_object("bucket", "a/b.txt", offset=6, length=5)
+    assert response.read() == b"world"
+    response.close()
+    assert storage.stat_object("bucket", "a/b.txt").size == 11
+    assert [o.object_name for o in storage.list_objects("bucket", prefix="a/", recursive=True)] == ["a/b.txt"]
+    storage.remove_object("bucket", "a/b.txt")
+    with pytest.raises(ObjectNotFound):
+        storage.stat_object("bucket", "a/b.txt")
+
+
+def test_object_names_cannot_escape_the_bucket(storage):
+    with pytest.raises(ValueError):
+        storage.file_path("bucket", "../other/secret.txt")
+
+
+def test_presigned_url_verifies(storage):
+    url = storage.presigned_get_object("bucket", "videos/a b.mp4", expires=timedelta(minutes=5),
+                                       response_headers={"response-content-type": "video/mp4"})
+    assert url.startswith("http://api.test/storage/bucket/")
+    bucket, object_name, params = signed_params(url)
+    assert (bucket, object_name, params["type"]) == ("bucket", "videos/a b.mp4", "video/mp4")
+    assert storage.verify(bucket, object_name, params)
+
+
+def test_tampered_url_is_rejected(storage):
+    bucket, object_name, params = signed_params(storage.presigned_get_object("bucket", "a.mp4"))
+    assert not storage.verify(bucket, "b.mp4", params)
+    assert not storage.verify(bucket, object_name, {**params, "type": "text/html"})
+    assert not storage.verify(bucket, object_name, {**params, "expires": str(int(params["expires"]) + 60)})
+    assert not storage.verify(bucket, object_name, {k: v for k, v in params.items() if k != "signature"})
+
+
+def test_other_secret_is_rejected(storage, tmp_path):
+    other = LocalStorage(root=str(tmp_path), secret="other")
+    bucket, object_name, params = signed_params(storage.presigned_get_object("bucket", "a.mp4"))
+    assert not other.verify(bucket, object_name, params)
+
+
+def test_expired_url_is_rejected(storage):
+    signed_at = datetime.now(timezone.utc) - timedelta(hours=2)
+    url = storage.presigned_get_object("bucket", "a.mp4", expires=timedelta(hours=1), request_date=signed_at)
+    assert not storage.verify(*signed_params(url))
+
+
+class CountingStorage:
+    def __init__(self):
+        self.signed = 0
+
+    def presigned_get_object(self, bucket_name, object_name, expires, response_headers=None, request_date=None):
+        self.signed += 1
+        return f"{object_name}?n={self.signed}"
+
+
+def test_url_cache_reuses_signatures():
+    storage = CountingStorage()
+    cache = PresignedUrlCache(storage, "bucket", expiry=3600, safety_margin=60)
+    first = cache.get_many(["a", "b"])
+    assert cache.get_many(["a", "b", "c"]) == {**first, "c": "c?n=3"}
+    assert storage.signed == 3
+
+
+def test_url_cache_re_signs_near_expiry(monkeypatch):
+    storage = CountingStorage()
+    cache = PresignedUrlCache(storage, "bucket", expiry=100, safety_margin=10)
+    url = cache.get("a")
+    now = time.time()
+    monkeypatch.setattr("storage.time.time", lambda: now + 95)  # inside the safety margin
+    assert cache.get("a") != url
+
+
+def test_url_cache_evicts_least_recently_used():
+    storage = CountingStorage()
+    cache = PresignedUrlCache(storage, "bucket", max_size=2)
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")  # refresh a
+    cache.get("c")  # evicts b
+    assert storage.signed == 3
+    cache.get("a")
+    cache.get("b")
+    assert storage.signed == 4
+
+
+def test_url_cache_invalidate():
+    storage = CountingStorage()
+    cache = PresignedUrlCache(storage, "bucket")
+    url = cache.get("a")
+    cache.invalidate("a")
+    assert cache.get("a") != url
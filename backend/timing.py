@@ -0,0 +1,49 @@
+# backend/timing.py
+# Per-stage timers for the RAG request path.
+#   - Every stage is observed in a Prometheus histogram (scraped from /metrics).
+#   - With TIMING_DEBUG=1, the per-request breakdown is also returned in a
+#     `Server-Timing` response header (visible in the browser dev tools).
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import Histogram
+
+TIMING_DEBUG = os.getenv("TIMING_DEBUG", "0") == "1"
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds",
+    "Time spent in each stage of the lesson/personalization request path",
+    ["route", "stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+# (stage, seconds) pairs recorded during the current request
+_request_stages: ContextVar[list | None] = ContextVar("request_stages", default=None)
+
+
+@contextmanager
+def stage(route: str, name: str):
+    """Times a block: `with stage("generate_lesson", "llm"): ...`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(route=route, stage=name).observe(elapsed)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages.append((name, elapsed))
+
+
+def start_request() -> list:
+    """Called by the middleware before the route runs; returns the list stages are appended to."""
+    stages = []
+    _request_stages.set(stages)
+    return stages
+
+
+def server_timing_header(stages: list, total: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
@@ -4,21 +4,49 @@ import sys
 import shutil
 import asyncio
 import traceback
-import psutil
-from rq import SimpleWorker, get_current_job
-from redis import Redis
+from datetime import datetime
+from rq import SimpleWorker, Queue, Callback, get_current_job
+from redis.exceptions import RedisError
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
+from sqlalchemy.dialects import postgresql, sqlite
 
-# Import your MinIO client
-from minio_client import minio_client, BUCKET_NAME
+# Object storage (MinIO or the local filesystem, see storage.py)
+from storage import storage_client, BUCKET_NAME
+from database import SessionLocal
+import models
+from render_executor import render_executor, warm_render_pool, RENDER_MODE, QUALITY_FLAGS
+from render_cache import RenderCache
+from scene_validator import validate_scene_code, dry_run_scene
+from extraction_cache import ExtractionCache
+from progress import publish_progress
+from hls import SegmentUploader, hls_enabled, playlist_path
+from lessons import build_personalize_chain, build_baseline_chain, BATCH_MAX_CONCURRENCY, get_embedding_model
 
 # Load Env
 load_dotenv()
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-redis_conn = Redis(host=REDIS_HOST, port=REDIS_PORT)
+# One pooled connection per process (REDIS_* env, see redis_client.py)
+from redis_client import redis_conn
+
+# Queues in priority order. Workers always drain the earlier ones first:
+#   interactive: preview renders a student is waiting on
+#   batch:       HQ re-renders of videos that already have a preview
+#   ingestion:   classroom-wide personalization and off-peak pre-generation
+#   default:     legacy queue, drained last so nothing enqueued before the split is lost
+QUEUE_INTERACTIVE = "interactive"
+QUEUE_BATCH = "batch"
+QUEUE_INGESTION = "ingestion"
+WORKER_QUEUES = [QUEUE_INTERACTIVE, QUEUE_BATCH, QUEUE_INGESTION, "default"]
+
+HQ_RENDERING_ENABLED = os.getenv("HQ_RENDERING_ENABLED", "1") == "1"
+HQ_JOB_TIMEOUT = 1800                                                      # seconds (RQ job timeout)
+HQ_RENDER_TIMEOUT = int(os.getenv("HQ_RENDER_TIMEOUT", 1500))              # seconds; keep below HQ_JOB_TIMEOUT
+interactive_queue = Queue(QUEUE_INTERACTIVE, connection=redis_conn)
+hq_queue = Queue(QUEUE_BATCH, connection=redis_conn)
+ingestion_queue = Queue(QUEUE_INGESTION, connection=redis_conn)
+render_cache = RenderCache(redis_conn, storage_client, BUCKET_NAME)
+extraction_cache = ExtractionCache(redis_conn)
 
 # --- YOUR CONFIGURATION ---
 API_KEY = os.getenv("GEMINI_API_KEY") # Ensure this matches your .env key name
@@ -27,14 +55,53 @@ if not API_KEY:
 
 client = genai.Client(api_key=API_KEY)
 
-def kill_child_processes(parent_pid):
-    """Kills any subprocesses (like Manim/Latex) started by this worker."""
+def cancel_key(job_id: str) -> str:
+    """Redis flag checked by the render executor while a job renders."""
+    return f"render_cancel:{job_id}"
+
+def report_progress(job_id: str, stage: str, **data):
+    """Publishes a stage for the live progress stream. Never fails the job."""
     try:
-        parent = psutil.Process(parent_pid)
-        for child in parent.children(recursive=True):
-            child.kill()
-    except:
-        pass
+        publish_progress(redis_conn, job_id, stage, **data)
+    except RedisError as e:
+        print(f"⚠️ Could not publish progress for Job {job_id}: {e}")
+
+def update_video(job_id: str, **fields):
+    """
+    Writes job state straight to generated_videos, so the API never has to ask Redis.
+    A video the user cancelled keeps its status.
+    """
+    db = SessionLocal()
+    try:
+        db.query(models.GeneratedVideo).filter(
+            models.GeneratedVideo.job_id == job_id,
+            models.GeneratedVideo.status != "cancelled"
+        ).update(fields, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def complete(job_id: str, result: dict) -> dict:
+    """Records a finished preview (and the HQ render that follows it) and returns the result."""
+    fields = {"status": "completed", "minio_path": result["minio_path"], "completed_at": datetime.utcnow()}
+    if result.get("hq_minio_path"):
+        fields.update(hq_status="completed", hq_minio_path=result["hq_minio_path"])
+    elif result.get("hq_job_id"):
+        fields.update(hq_status="queued", hq_job_id=result["hq_job_id"])
+    update_video(job_id, **fields)
+
+    report_progress(job_id, "completed", minio_path=result["minio_path"], hq_pending="hq_job_id" in result)
+    return result
+
+def video_job_failed(job, connection, type, value, traceback):
+    """RQ on_failure callback: the task died without recording its own failure."""
+    update_video(job.id, status="failed", error=f"{type.__name__}: {value}", completed_at=datetime.utcnow())
+    report_progress(job.id, "failed", error=str(value))
+
+def hq_job_failed(job, connection, type, value, traceback):
+    """RQ on_failure callback for HQ renders (job.args[2] is the preview's job id)."""
+    update_video(job.args[2], hq_status="failed")
+    report_progress(job.args[2], "hq_failed", error=str(value))
 
 def convert_doc_to_latex(doc_content: str) -> str:
     """
@@ -68,9 +135,11 @@ def convert_doc_to_latex(doc_content: str) -> str:
         print(f"❌ LaTeX Conversion Failed: {e}")
         raise e
 
-def generate_manim_code(latex_content: str) -> str:
+def generate_manim_code(latex_content: str, job_id: str, work_dir: str) -> str:
     """
     Step 2: Your specific 'Hardened Prompt' logic to generate Manim code.
+    Each candidate is checked statically and with a last-frame dry run;
+    the problems found are fed back into the next attempt.
     """
     print("🎨 Generating Manim code from LaTeX...")
     
@@ -106,6 +175,7 @@ def generate_manim_code(latex_content: str) -> str:
     • NEVER highlight MathTex using indices.
     """
 
+    feedback = ""
     for attempt in range(4): # Retry loop
         try:
             response = client.models.generate_content(
@@ -115,7 +185,7 @@ def generate_manim_code(latex_content: str) -> str:
                         role="user",
                         parts=[
                             types.Part.from_text(text=f"LATEX SOURCE:\n{latex_content}"),
-                            types.Part.from_text(text=base_prompt)
+                            types.Part.from_text(text=base_prompt + feedback)
                         ]
                     )
                 ]
@@ -125,9 +195,19 @@ def generate_manim_code(latex_content: str) -> str:
             if "from manim import *" not in code:
                 code = "from manim import *\n" + code
             
-            # Basic validation
-            if "substrings_to_isolate" in code or "equation[" in code:
-                print(f"⚠️ Attempt {attempt}: Unsafe code detected, retrying...")
+            # Static validation (AST), then a fast dry run for LaTeX/runtime errors
+            problems = validate_scene_code(code)
+            if not problems:
+                script_path = os.path.join(work_dir, f"candidate_{attempt}.py")
+                with open(script_path, "w", encoding="utf-8") as f:
+                    f.write(code)
+                problems = dry_run_scene(job_id, script_path, work_dir)
+
+            if problems:
+                print(f"⚠️ Attempt {attempt}: Invalid code detected, retrying...")
+                feedback = "\n\nPREVIOUS OUTPUT WAS INVALID. Fix ALL of these problems:\n" + "\n".join(
+                    f"- {p}" for p in problems
+                )
                 continue
                 
             return code
@@ -136,25 +216,40 @@ def generate_manim_code(latex_content: str) -> str:
             
     raise Exception("Failed to generate safe Manim code after retries.")
 
-def render_scene(job_id: str, code: str, output_dir: str):
+def render_scene(job_id: str, code: str, output_dir: str, quality: str = "low_quality",
+                 disable_caching: bool = False, timeout: int | None = None):
     """
     Step 3: Renders the code using system Manim.
+    `timeout` defaults to RENDER_TIMEOUT (sized for previews).
     """
     script_path = os.path.join(output_dir, "scene.py")
     with open(script_path, "w", encoding="utf-8") as f:
         f.write(code)
 
-    print(f"🎬 Rendering Job {job_id}...")
+    print(f"🎬 Rendering Job {job_id} ({quality})...")
     
-    # Run Manim command
-    # -pql = Preview quality (Low) - Change to -pqh for High quality
+    log_path = os.path.join(output_dir, "render.log")
+    cancel_check = lambda: redis_conn.exists(cancel_key(job_id))
+
+    # Warm workers already imported Manim and return the MP4 path directly
+    if RENDER_MODE == "warm":
+        return warm_render_pool.render(
+            job_id, script_path, output_dir, quality, log_path, cancel_check=cancel_check,
+            config_overrides={"disable_caching": True} if disable_caching else None,
+            timeout=timeout
+        )
+
+    # Run Manim as a managed subprocess (timeout, memory limit, captured log)
+    # -ql = Low quality (preview), -qh = High quality
     # --media_dir = Explicit output path
-    cmd = f'manim -ql --media_dir "{output_dir}" "{script_path}" MathScene'
-    
-    exit_code = os.system(cmd)
-    
-    if exit_code != 0:
-        raise Exception("Manim render command failed.")
+    # --disable_caching = partial movie files get ordered names (needed for HLS segments)
+    cmd = [
+        sys.executable, "-m", "manim", QUALITY_FLAGS[quality],
+        "--media_dir", output_dir, script_path, "MathScene"
+    ]
+    if disable_caching:
+        cmd.insert(3, "--disable_caching")
+    render_executor.run(job_id, cmd, log_path=log_path, timeout=timeout, cancel_check=cancel_check)
 
     # Locate the video file
     video_dir = os.path.join(output_dir, "videos", "scene", "480p15") # Depends on quality flags
@@ -175,36 +270,271 @@ def process_doc_to_video_task(content: str, job_id: str):
     job = get_current_job()
     work_dir = f"temp_{job_id}"
     os.makedirs(work_dir, exist_ok=True)
+    update_video(job_id, status="processing", started_at=datetime.utcnow())
+    report_progress(job_id, "started")
     
     try:
+        # Previous runs on the same content skip the LLM calls
+        cached = extraction_cache.get(content)
+
         # 1. Convert Doc -> LaTeX
-        latex = convert_doc_to_latex(content)
+        latex = cached.get("latex")
+        if latex is None:
+            latex = convert_doc_to_latex(content)
+            extraction_cache.put(content, latex=latex)
         print(f"📝 Extracted LaTeX: {latex[:50]}...")
+        report_progress(job_id, "latex_extracted")
+
+        # Same equation already rendered? Reuse that video.
+        cached_path = render_cache.lookup("latex", latex)
+        if cached_path:
+            print(f"⚡ Job {job_id} served from render cache (LaTeX): {cached_path}")
+            return complete(job_id, {
+                "status": "success", "minio_path": cached_path, "cache_hit": True,
+                **schedule_hq_render(job_id, cached.get("code"), latex)
+            })
         
         # 2. Generate Code
-        code = generate_manim_code(latex)
+        code = cached.get("code")
+        if code is None:
+            code = generate_manim_code(latex, job_id, work_dir)
+            extraction_cache.put(content, code=code)
+        report_progress(job_id, "code_generated")
+
+        cached_path = render_cache.lookup("code", code)
+        if cached_path:
+            render_cache.store(cached_path, latex=latex)
+            print(f"⚡ Job {job_id} served from render cache (code): {cached_path}")
+            return complete(job_id, {
+                "status": "success", "minio_path": cached_path, "cache_hit": True,
+                **schedule_hq_render(job_id, code, latex)
+            })
         
-        # 3. Render
-        video_local_path = render_scene(job_id, code, work_dir)
+        # 3. Render (low-quality preview), streaming HLS segments while Manim writes them
+        uploader = None
+        if hls_enabled():
+            uploader = SegmentUploader(job_id, work_dir, storage_client, BUCKET_NAME)
+            uploader.start()
+            update_video(job_id, playlist_path=playlist_path(job_id))
+        report_progress(job_id, "rendering", streaming=uploader is not None)
+        try:
+            video_local_path = render_scene(job_id, code, work_dir, disable_caching=uploader is not None)
+        except Exception:
+            if uploader:
+                uploader.finish(render_ok=False)
+                update_video(job_id, playlist_path=None)
+            raise
+        if uploader and not uploader.finish():
+            update_video(job_id, playlist_path=None)
         
         # 4. Upload
+        report_progress(job_id, "uploading")
         minio_path = f"generated_videos/{job_id}.mp4"
-        minio_client.fput_object(BUCKET_NAME, minio_path, video_local_path)
+        storage_client.fput_object(BUCKET_NAME, minio_path, video_local_path)
+        render_cache.store(minio_path, code=code, latex=latex)
         
         print(f"✅ Job {job_id} Completed: {minio_path}")
-        return {"status": "success", "minio_path": minio_path}
+        # 5. High-quality version fills idle capacity later
+        return complete(job_id, {"status": "success", "minio_path": minio_path, **schedule_hq_render(job_id, code, latex)})
 
     except Exception as e:
         print(f"❌ Job {job_id} Failed: {e}")
         traceback.print_exc()
+        # Don't serve code that failed to render to the next submission
+        extraction_cache.drop(content, "code")
+        if redis_conn.exists(cancel_key(job_id)):
+            report_progress(job_id, "cancelled")
+        else:
+            update_video(job_id, status="failed", error=str(e), completed_at=datetime.utcnow())
+            report_progress(job_id, "failed", error=str(e))
         return {"status": "failed", "error": str(e)}
         
     finally:
-        kill_child_processes(os.getpid())
         if os.path.exists(work_dir):
             shutil.rmtree(work_dir)
 
+def schedule_hq_render(job_id: str, code: str | None, latex: str | None) -> dict:
+    """
+    Finds or queues the high-quality render that follows a preview.
+    Returns the fields to merge into the preview job's result.
+    """
+    if not HQ_RENDERING_ENABLED:
+        return {}
+
+    hq_path = render_cache.lookup("latex", latex, "high_quality") if latex else None
+    if not hq_path and code:
+        hq_path = render_cache.lookup("code", code, "high_quality")
+    if hq_path:
+        return {"hq_minio_path": hq_path}
+    if not code:
+        return {}
+
+    hq_job_id = f"{job_id}-hq"
+    hq_queue.enqueue_call(
+        func='worker.render_hq_task',
+        args=(code, latex, job_id),
+        job_id=hq_job_id,
+        timeout=HQ_JOB_TIMEOUT,
+        on_failure=Callback('worker.hq_job_failed'),
+    )
+    return {"hq_job_id": hq_job_id}
+
+def render_hq_task(code: str, latex: str | None, job_id: str):
+    """
+    Low-priority Task: Re-renders an already validated scene in high quality.
+    """
+    hq_job_id = f"{job_id}-hq"
+    print(f"🎞️ HQ render for Job {job_id}")
+    work_dir = f"temp_{hq_job_id}"
+    os.makedirs(work_dir, exist_ok=True)
+    # HQ stages go on the preview's channel, the browser is already listening there
+    report_progress(job_id, "hq_rendering")
+
+    try:
+        video_local_path = render_scene(hq_job_id, code, work_dir, quality="high_quality",
+                                        timeout=HQ_RENDER_TIMEOUT)
+
+        minio_path = f"generated_videos/{job_id}_hq.mp4"
+        storage_client.fput_object(BUCKET_NAME, minio_path, video_local_path)
+        render_cache.store(minio_path, code=code, latex=latex, quality="high_quality")
+
+        print(f"✅ HQ Job {job_id} Completed: {minio_path}")
+        update_video(job_id, hq_status="completed", hq_minio_path=minio_path)
+        report_progress(job_id, "hq_completed", minio_path=minio_path)
+        return {"status": "success", "minio_path": minio_path}
+
+    except Exception as e:
+        print(f"❌ HQ Job {job_id} Failed: {e}")
+        traceback.print_exc()
+        update_video(job_id, hq_status="failed")
+        report_progress(job_id, "hq_failed", error=str(e))
+        return {"status": "failed", "error": str(e)}
+
+    finally:
+        if os.path.exists(work_dir):
+            shutil.rmtree(work_dir)
+
+def personalize_classroom_task(full_text: str, topic: str, grade: str, students: list):
+    """
+    Batch Task: Personalizes one document for every student of a classroom.
+    The document text is loaded once by the API and shared by all generations.
+    """
+    print(f"📚 Personalizing '{topic}' for {len(students)} students...")
+    chain = build_personalize_chain()
+
+    inputs = [
+        {
+            "name": student["name"],
+            "grade": grade,
+            "interest": student["interest"],
+            "full_text": full_text
+        }
+        for student in students
+    ]
+
+    # 1. Run the generations with bounded concurrency
+    outputs = chain.batch(
+        inputs,
+        config={"max_concurrency": BATCH_MAX_CONCURRENCY},
+        return_exceptions=True
+    )
+
+    lessons = []
+    failed_student_ids = []
+    for student, output in zip(students, outputs):
+        if isinstance(output, Exception):
+            print(f"⚠️ Personalization failed for student {student['id']}: {output}")
+            failed_student_ids.append(student["id"])
+            continue
+        lessons.append(models.GeneratedLesson(
+            topic=topic,
+            content=output,
+            student_id=student["id"]
+        ))
+
+    # 2. Write all lessons in one transaction
+    db = SessionLocal()
+    try:
+        db.add_all(lessons)
+        db.commit()
+    finally:
+        db.close()
+
+    print(f"✅ Created {len(lessons)} lessons ({len(failed_student_ids)} failed)")
+    return {
+        "status": "success" if lessons else "failed",
+        "lessons_created": len(lessons),
+        "failed_student_ids": failed_student_ids
+    }
+
+def upsert_baseline_lesson(db, topic: str, grade: str, content: str):
+    """INSERT ... ON CONFLICT (topic, grade_level) DO UPDATE, newest content wins."""
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    values = {"topic": topic, "grade_level": grade, "content": content, "created_at": datetime.utcnow()}
+    return insert(models.BaselineLesson).values(**values).on_conflict_do_update(
+        index_elements=["topic", "grade_level"],
+        set_={"content": content, "created_at": values["created_at"]}
+    )
+
+def precompute_baseline_lessons(topics: list, grade_levels: list, persist_directory: str, collection_name: str = "langchain"):
+    """
+    Off-peak Task: Generates a baseline lesson for every syllabus topic and grade level,
+    so they can be served instantly or used as a draft for personalization.
+    """
+    # Heavy imports stay here so video jobs don't pay for them
+    from langchain_community.vectorstores import Chroma
+
+    db = SessionLocal()
+    try:
+        # 1. Skip what was already generated by a previous run
+        existing = {
+            (row.topic, row.grade_level)
+            for row in db.query(models.BaselineLesson.topic, models.BaselineLesson.grade_level).all()
+        }
+        pending = [(t, g) for t in topics for g in grade_levels if (t, g) not in existing]
+        print(f"🌙 Pre-generating {len(pending)} baseline lessons ({len(existing)} already cached)...")
+        if not pending:
+            return {"status": "success", "lessons_created": 0}
+
+        # 2. Retrieve the context once per topic
+        vector_store = Chroma(
+            collection_name=collection_name,
+            embedding_function=get_embedding_model(),
+            persist_directory=persist_directory
+        )
+        contexts = {}
+        for topic in {t for t, _ in pending}:
+            chunks = vector_store.similarity_search(topic, k=4)
+            contexts[topic] = "\n\n".join(chunk.page_content for chunk in chunks)
+
+        # 3. Generate with bounded concurrency
+        chain = build_baseline_chain()
+        outputs = chain.batch(
+            [{"topic": t, "grade": g, "context": contexts[t]} for t, g in pending],
+            config={"max_concurrency": BATCH_MAX_CONCURRENCY},
+            return_exceptions=True
+        )
+
+        # 4. Upsert row by row: an overlapping or retried run may have stored some meanwhile
+        stored = 0
+        for (topic, grade), output in zip(pending, outputs):
+            if isinstance(output, Exception):
+                print(f"⚠️ Baseline lesson failed for '{topic}' ({grade}): {output}")
+                continue
+            db.execute(upsert_baseline_lesson(db, topic, grade, output))
+            stored += 1
+
+        db.commit()
+        print(f"✅ Stored {stored} baseline lessons")
+        return {"status": "success", "lessons_created": stored}
+    finally:
+        db.close()
+
 if __name__ == "__main__":
+    # Single worker for local development; production runs supervisor.py
     print("👷 Manim Worker Started...")
-    worker = SimpleWorker(["default"], connection=redis_conn)
-    worker.work()
\ No newline at end of file
+    if RENDER_MODE == "warm":
+        warm_render_pool.start()  # pay the Manim import before the first job, not during it
+    worker = SimpleWorker(WORKER_QUEUES, connection=redis_conn)
+    # The scheduler runs jobs enqueued with enqueue_at (e.g. off-peak pre-generation)
+    worker.work(with_scheduler=True)
\ No newline at end of file
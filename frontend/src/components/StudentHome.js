@@ -4,12 +4,14 @@ import VideoGenerator from "./VideoGenerator"; // <--- Import here
 
 export default function StudentHome({ user }) {
   const [availableClassrooms, setAvailableClassrooms] = useState([]);
+  const [availableCursor, setAvailableCursor] = useState(null); // X-Next-Cursor, null on the last page
   const [enrolledClassrooms, setEnrolledClassrooms] = useState([]);
   const [selectedClassId, setSelectedClassId] = useState("");
 
   // Smart Learning State
   const [mode, setMode] = useState("chat"); // 'chat' or 'document'
   const [classroomDocs, setClassroomDocs] = useState([]);
+  const [docsCursor, setDocsCursor] = useState(null);
   
   const [learningData, setLearningData] = useState({
     classroom_id: "",
@@ -23,6 +25,28 @@ export default function StudentHome({ user }) {
   const [generatedContent, setGeneratedContent] = useState(null);
   const [loading, setLoading] = useState(false);
 
+  // Fetch one page of a paginated list; the next page's cursor comes in a header
+  async function fetchPage(url, cursor) {
+    const token = localStorage.getItem("token");
+    const res = await fetch(cursor ? `${url}?cursor=${cursor}` : url, {
+      headers: { Authorization: `Bearer ${token}` }
+    });
+    if (!res.ok) throw new Error(`Failed to load ${url}`);
+    return { items: await res.json(), next: res.headers.get("X-Next-Cursor") };
+  }
+
+  async function loadAvailable(cursor = null) {
+    const { items, next } = await fetchPage("http://localhost:8000/classrooms/available/summary", cursor);
+    setAvailableClassrooms(prev => (cursor ? [...prev, ...items] : items));
+    setAvailableCursor(next);
+  }
+
+  async function loadDocs(classroomId, cursor = null) {
+    const { items, next } = await fetchPage(`http://localhost:8000/classrooms/${classroomId}/documents`, cursor);
+    setClassroomDocs(prev => (cursor ? [...prev, ...items] : items));
+    setDocsCursor(next);
+  }
+
   // 1. Fetch Classrooms on Load
   useEffect(() => {
     async function fetchData() {
@@ -30,12 +54,11 @@ export default function StudentHome({ user }) {
         const token = localStorage.getItem("token");
         const headers = { Authorization: `Bearer ${token}` };
 
-        // Fetch Available (for joining)
-        const resAvail = await fetch("http://localhost:8000/classrooms/available", { headers });
-        if (resAvail.ok) setAvailableClassrooms(await resAvail.json());
+        // Fetch Available (for joining); summaries, the roster isn't shown here
+        await loadAvailable();
 
         // Fetch Enrolled (for learning)
-        const resEnrolled = await fetch("http://localhost:8000/classrooms/enrolled", { headers });
+        const resEnrolled = await fetch("http://localhost:8000/classrooms/enrolled/summary", { headers });
         if (resEnrolled.ok) setEnrolledClassrooms(await resEnrolled.json());
 
       } catch (err) {
@@ -48,13 +71,7 @@ export default function StudentHome({ user }) {
   // 2. Fetch Documents when Classroom is Selected
   useEffect(() => {
     if (learningData.classroom_id) {
-        const token = localStorage.getItem("token");
-        fetch(`http://localhost:8000/classrooms/${learningData.classroom_id}/documents`, {
-            headers: { Authorization: `Bearer ${token}` }
-        })
-        .then(res => res.json())
-        .then(data => setClassroomDocs(data))
-        .catch(err => console.error(err));
+        loadDocs(learningData.classroom_id).catch(err => console.error(err));
     }
   }, [learningData.classroom_id]);
 
@@ -162,6 +179,11 @@ export default function StudentHome({ user }) {
             </select>
             <button className="btn-primary" onClick={handleJoin}>Join</button>
           </div>
+          {availableCursor && (
+            <button className="tab-btn" onClick={() => loadAvailable(availableCursor).catch(err => console.error(err))}>
+              Load more classrooms
+            </button>
+          )}
           <p>Enrolled: {enrolledClassrooms.length} classes</p>
         </div>
 
@@ -237,6 +259,14 @@ export default function StudentHome({ user }) {
                             <option key={d.id} value={d.id}>{d.filename}</option>
                         ))}
                     </select>
+                    {docsCursor && (
+                        <button
+                            className="tab-btn"
+                            onClick={() => loadDocs(learningData.classroom_id, docsCursor).catch(err => console.error(err))}
+                        >
+                            Load more documents
+                        </button>
+                    )}
                     <p style={{fontSize: "0.8rem", color: "#666", margin: 0}}>
                         This will rewrite the entire document using analogies from your interest.
                     </p>
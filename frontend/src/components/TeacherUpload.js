@@ -12,7 +12,7 @@ export default function TeacherUpload() {
     async function fetchClassrooms() {
       const token = localStorage.getItem("token");
       try {
-        const response = await fetch("http://localhost:8000/classrooms/me", {
+        const response = await fetch("http://localhost:8000/classrooms/me/summary", {
           headers: {
             Authorization: `Bearer ${token}`,
           },
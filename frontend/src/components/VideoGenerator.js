@@ -1,47 +1,105 @@
 import { useState, useEffect, useRef } from "react";
 import "./VideoGenerator.css";
 
+// Progress stages pushed by the worker (see backend/progress.py)
+const STAGE_LABELS = {
+  started: "Reading your content…",
+  latex_extracted: "Equation extracted, writing the animation…",
+  code_generated: "Animation written, rendering…",
+  rendering: "Rendering…",
+  uploading: "Uploading…",
+};
+const FINISHED_STAGES = ["completed", "failed", "cancelled"];
+// Native HLS playback (Safari, iOS, Android) for the live preview while rendering
+const CAN_PLAY_HLS =
+  document.createElement("video").canPlayType("application/vnd.apple.mpegurl") !== "";
+
 export default function VideoGenerator() {
   const [activeTab, setActiveTab] = useState("file"); // 'file' or 'text'
   const [file, setFile] = useState(null);
   const [text, setText] = useState("");
   const [jobId, setJobId] = useState(null);
   const [status, setStatus] = useState(null); // 'queued', 'started', 'completed', 'failed'
+  const [stage, setStage] = useState(null); // latest progress stage of the current job
   const [videoUrl, setVideoUrl] = useState(null);
+  const [playlistUrl, setPlaylistUrl] = useState(null);
   const [error, setError] = useState("");
   const fileInputRef = useRef(null);
   const [videos, setVideos] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null); // X-Next-Cursor of the last page loaded
 
-  // Add this useEffect to load history
+  // Load history once; progress events refresh it when a job finishes
   useEffect(() => {
     fetchHistory();
-    const interval = setInterval(fetchHistory, 5000); // Auto-refresh every 5s
-    return () => clearInterval(interval);
   }, []);
 
-  async function fetchHistory() {
+  // Newest page first; "Load more" appends the next page after the cursor
+  async function fetchHistory(cursor = null) {
     const token = localStorage.getItem("token");
-    const res = await fetch("http://localhost:8000/videos/mine", {
+    const query = cursor ? `?cursor=${cursor}` : "";
+    const res = await fetch(`http://localhost:8000/videos/mine${query}`, {
       headers: { Authorization: `Bearer ${token}` },
     });
-    if (res.ok) setVideos(await res.json());
+    if (!res.ok) return;
+    const page = await res.json();
+    setVideos((prev) => (cursor ? [...prev, ...page] : page));
+    setNextCursor(res.headers.get("X-Next-Cursor"));
   }
-  // Poll for status when a Job ID exists and isn't finished
+  // Follow the job's progress pushed by the server instead of polling
   useEffect(() => {
-    let intervalId;
+    if (!jobId) return;
+    const controller = new AbortController();
+    followProgress(jobId, controller.signal);
+    return () => controller.abort();
+  }, [jobId]);
 
-    if (jobId && status !== "completed" && status !== "failed") {
-      intervalId = setInterval(checkStatus, 3000); // Poll every 3 seconds
+  // Server-Sent Events read with fetch (EventSource can't send the auth header)
+  async function followProgress(id, signal) {
+    const token = localStorage.getItem("token");
+    try {
+      const res = await fetch(`http://localhost:8000/chat/video_events/${id}`, {
+        headers: { Authorization: `Bearer ${token}` },
+        signal,
+      });
+      if (!res.ok) return;
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const messages = buffer.split("\n\n");
+        buffer = messages.pop(); // keep the incomplete tail
+        for (const message of messages) {
+          const data = message.split("\n").find((line) => line.startsWith("data: "));
+          if (data) await handleProgress(id, JSON.parse(data.slice(6)));
+        }
+      }
+    } catch (err) {
+      if (err.name !== "AbortError") console.error("Progress stream error:", err);
     }
+  }
 
-    return () => clearInterval(intervalId);
-  }, [jobId, status]);
+  async function handleProgress(id, event) {
+    setStage(event.stage);
+    if (FINISHED_STAGES.includes(event.stage)) {
+      await checkStatus(id); // final record with a signed URL
+      fetchHistory();
+    } else if (event.stage === "hq_completed" || event.stage === "hq_failed") {
+      fetchHistory();
+    } else if (!event.stage.startsWith("hq_")) {
+      setStatus("started");
+      if (event.stage === "rendering" && event.streaming) checkStatus(id);
+    }
+  }
 
-  async function checkStatus() {
+  async function checkStatus(id) {
     const token = localStorage.getItem("token");
     try {
       const res = await fetch(
-        `http://localhost:8000/chat/video_status/${jobId}`,
+        `http://localhost:8000/chat/video_status/${id}`,
         {
           headers: { Authorization: `Bearer ${token}` },
         }
@@ -50,7 +108,8 @@ export default function VideoGenerator() {
       if (!res.ok) return;
 
       const data = await res.json();
-      setStatus(data.status);
+      setStatus(data.status === "processing" ? "started" : data.status);
+      if (data.playlist_url) setPlaylistUrl(data.playlist_url);
 
       if (data.status === "completed" && data.video_url) {
         setVideoUrl(data.video_url);
@@ -58,7 +117,7 @@ export default function VideoGenerator() {
         setError(data.message || "Video generation failed.");
       }
     } catch (err) {
-      console.error("Polling error:", err);
+      console.error("Status error:", err);
     }
   }
 
@@ -66,7 +125,9 @@ export default function VideoGenerator() {
     e.preventDefault();
     setError("");
     setVideoUrl(null);
+    setPlaylistUrl(null);
     setStatus("queued");
+    setStage(null);
     setJobId(null);
 
     const token = localStorage.getItem("token");
@@ -100,6 +161,7 @@ export default function VideoGenerator() {
 
       const data = await res.json();
       setJobId(data.job_id);
+      fetchHistory();
     } catch (err) {
       setError(err.message);
       setStatus(null);
@@ -178,13 +240,20 @@ export default function VideoGenerator() {
                 </div>
                 {v.status === 'completed' && (
                     <div className="video-player">
-                        <video controls src={v.video_url} width="100%" />
-                        <a href={v.video_url} download>⬇ Download</a>
+                        {/* Preview first, HQ once it has rendered */}
+                        <video controls src={v.hq_video_url || v.video_url} width="100%" />
+                        <a href={v.hq_video_url || v.video_url} download>⬇ Download</a>
+                        {v.hq_status === 'queued' && <span className="status queued">HD rendering…</span>}
                     </div>
                 )}
             </div>
         ))}
     </div>
+    {nextCursor && (
+        <button type="button" className="tab-btn" onClick={() => fetchHistory(nextCursor)}>
+            Load more
+        </button>
+    )}
 </div>
       {/* Status & Result */}
       {status && (
@@ -192,6 +261,7 @@ export default function VideoGenerator() {
           <p>
             Status: <strong>{status.toUpperCase()}</strong>
           </p>
+          {status === "started" && STAGE_LABELS[stage] && <p>{STAGE_LABELS[stage]}</p>}
           {(status === "queued" || status === "started") && (
             <div className="loading-bar">
               <div className="loading-fill"></div>
@@ -200,6 +270,13 @@ export default function VideoGenerator() {
         </div>
       )}
 
+      {!videoUrl && playlistUrl && CAN_PLAY_HLS && (
+        <div className="video-result">
+          <h3>🎬 Live Preview</h3>
+          <video controls autoPlay muted src={playlistUrl} width="100%" />
+        </div>
+      )}
+
       {videoUrl && (
         <div className="video-result">
           <h3>✅ Video Ready!</h3>
@@ -1,6 +1,9 @@
 import os
+import sys
 import json
 from dotenv import load_dotenv
+from redis import Redis
+from rq import Queue
 
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -82,4 +85,26 @@ vector_store = Chroma.from_documents(
     persist_directory="./chroma_db"
 )
 
-print("✅ Success! Database created locally.")
\ No newline at end of file
+print("✅ Success! Database created locally.")
+
+# --- PART C: SCHEDULE OFF-PEAK LESSON PRE-GENERATION ---
+# The backend worker (started with the scheduler) generates a baseline lesson
+# per syllabus topic and grade level at the next off-peak hour.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from lessons import PRECOMPUTE_GRADE_LEVELS, next_offpeak_time
+
+try:
+    topics = json.loads(syllabus_text)
+    redis_conn = Redis(host=os.getenv("REDIS_HOST", "localhost"), port=int(os.getenv("REDIS_PORT", 6379)))
+    run_at = next_offpeak_time()
+    Queue("ingestion", connection=redis_conn).enqueue_at(
+        run_at,
+        'worker.precompute_baseline_lessons',
+        topics,
+        PRECOMPUTE_GRADE_LEVELS,
+        os.path.abspath("./chroma_db"),
+        job_timeout=3600,
+    )
+    print(f"🌙 Scheduled baseline lessons for {len(topics)} topics at {run_at:%Y-%m-%d %H:%M}.")
+except Exception as e:
+    print(f"⚠️ Could not schedule lesson pre-generation: {e}")